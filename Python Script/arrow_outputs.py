@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import time
+from importlib.util import find_spec
+from lazy_imports import LazyModule
+
+from compact_types import widen_float32
+from local_store import STORE_PATH
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
+
+# === Arrow IPC (Feather v2) copies of the extractor tables, memory-mappable ===
+# pyarrow is optional and slow to import: only checked for here, loaded on the first write / read
+if find_spec("pyarrow") is not None:
+    pa = LazyModule("pyarrow")
+    feather = LazyModule("pyarrow.feather")
+else:
+    pa = feather = None
+
+ARROW_DIR = os.path.join(os.path.dirname(STORE_PATH), "arrow")
+
+
+def arrow_path(name):
+    return os.path.join(ARROW_DIR, f"{name}.arrow")
+
+
+def arrow_column(series):
+    """Series as an Arrow array; nested values become JSON text, mixed scalars become strings"""
+    try:
+        return pa.array(widen_float32(series), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        text = series.map(
+            lambda v: json.dumps(v, default=str) if isinstance(v, (list, dict)) else (None if pd.isna(v) else str(v))
+        )
+        return pa.array(text, type=pa.string(), from_pandas=True)
+
+
+def write_arrow(name, df):
+    """Write df as an uncompressed Feather v2 file (uncompressed so readers can memory-map it zero-copy)"""
+    if feather is None:
+        print(f"  ⚠️ pyarrow not installed — skipping Arrow output '{name}'")
+        return None
+    if df is None or len(df.columns) == 0:
+        return None
+    start = time.time()
+    os.makedirs(ARROW_DIR, exist_ok=True)
+    df = df.reset_index(drop=True)
+    table = pa.table({str(col): arrow_column(df[col]) for col in df.columns})
+    path = arrow_path(name)
+    tmp_path = path + ".tmp"
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)   # readers never see a half-written file
+    print(f"  🏹 Wrote {len(df)} rows to {path} ({time.time() - start:.1f}s)")
+    return path
+
+
+def open_arrow(name, columns=None):
+    """Memory-mapped Arrow table: only the pages of the requested columns are ever read"""
+    if feather is None:
+        raise RuntimeError("pyarrow is required to read Arrow outputs")
+    source = pa.memory_map(arrow_path(name), "r")
+    table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns else table
+
+
+def read_arrow(name, columns=None):
+    """Arrow output as a DataFrame (only `columns` are materialized)"""
+    return open_arrow(name, columns).to_pandas()
+
+
+# === Example usage: python arrow_outputs.py <name> [column ...] ===
+if __name__ == "__main__":
+    start = time.time()
+    table = open_arrow(sys.argv[1], sys.argv[2:] or None)
+    print(f"Opened {sys.argv[1]}: {table.num_rows} rows x {table.num_columns} columns in {(time.time() - start) * 1000:.1f} ms")
+    print(table.slice(0, 5).to_pandas().to_string())
@@ -1,6 +1,11 @@
-import requests
+import os
 import json
 import time
+import tempfile
+from lazy_imports import LazyModule
+
+# heavy dependencies load on first use
+requests = LazyModule("requests")
 
 # === LOGIN API DETAILS ===
 LOGIN_URL = "https://app.indecab.com/api/beta/login"
@@ -16,6 +21,37 @@ AUTH_DETAILS = {
     "expiry": 0   # token expiry timestamp
 }
 
+# === Token cache shared by every script run (skips the login call on quick runs) ===
+TOKEN_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".indecab_token.json")
+
+
+def _load_cached_token():
+    """Fill AUTH_DETAILS from the on-disk cache if it holds an unexpired token"""
+    try:
+        with open(TOKEN_CACHE_PATH, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if cached.get("X-Auth-Token") and time.time() < cached.get("expiry", 0):
+        AUTH_DETAILS.update(cached)
+        return True
+    return False
+
+
+def _save_cached_token():
+    """Owner-only (0600) temp file swapped in atomically, so concurrent jobs never read half a token"""
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=".indecab_token.", dir=os.path.dirname(TOKEN_CACHE_PATH))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(AUTH_DETAILS, f)
+        os.replace(tmp_path, TOKEN_CACHE_PATH)
+    except OSError as e:
+        print(f"⚠️ Could not cache token: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 def login():
     """Call login API to get new token and set expiry time"""
     resp = requests.post(LOGIN_URL, json=LOGIN_PAYLOAD)
@@ -28,11 +64,14 @@ def login():
     AUTH_DETAILS["X-User-Id"] = auth_data.get("userId")
     AUTH_DETAILS["X-Auth-Token"] = auth_data.get("authToken")
     AUTH_DETAILS["expiry"] = time.time() + (48 * 60 * 60)  # 48 hours validity
+    _save_cached_token()
     print("✅ New token fetched successfully")
 
-def get_auth_headers():
-    """Return valid headers, refresh token if expired"""
-    if time.time() > AUTH_DETAILS["expiry"] or not AUTH_DETAILS["X-Auth-Token"]:
+def get_auth_headers(force=False):
+    """Return valid headers, refresh token if expired (force=True after a 401)"""
+    if not AUTH_DETAILS["X-Auth-Token"] and not force:
+        _load_cached_token()
+    if force or time.time() > AUTH_DETAILS["expiry"] or not AUTH_DETAILS["X-Auth-Token"]:
         print("🔄 Token expired or missing, refreshing...")
         login()
     return {
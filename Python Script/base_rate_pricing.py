@@ -0,0 +1,158 @@
+import time
+from lazy_imports import LazyModule
+
+from compact_types import excel_ready
+from local_store import query, save_table
+from reference_data import load_reference
+
+# heavy dependencies load on first use
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# === PATH TO SAVE FILE ===
+ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\pricing_variances.xlsx"
+
+# === Column names (Base Rate.xlsx / billed duties / invoices) ===
+RATE_VEHICLE_COL = "Type Of Car"
+RATE_DUTY_COL = "Duty Type"
+RATE_PRICE_COL = "Base Price"
+RATE_CUSTOMER_COL = "Customer"        # optional; rows without it apply to every customer
+ANY_CUSTOMER = "*"
+
+DUTY_VEHICLE_COL = "Vehicle Type"
+DUTY_CUSTOMER_COL = "Customer Name"
+DUTY_TYPE_CANDIDATES = ["dutyType", "dutyType.name", "dutyPackage", "package"]
+INVOICE_AMOUNT_CANDIDATES = ["amount", "totalAmount", "grandTotal", "total"]
+INVOICE_ID_CANDIDATES = ["id", "invoiceId", "_id", "invoiceNumber"]
+
+# Variance is flagged when both limits are exceeded
+VARIANCE_ABS_LIMIT = 50.0     # rupees
+VARIANCE_PCT_LIMIT = 5.0      # percent of expected charge
+
+
+def normalize_key(series):
+    """Vectorized key cleanup: trim, collapse spaces, upper-case"""
+    # clean each distinct value once, then broadcast back through the codes
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    cleaned = (
+        pd.Series(uniques, dtype="string")
+        .str.strip()
+        .str.replace(r"\s+", " ", regex=True)
+        .str.upper()
+        .fillna("")
+        .to_numpy(dtype=object)
+    )
+    cleaned = np.append(cleaned, "")     # slot for missing values (code -1)
+    return pd.Series(cleaned[codes], index=series.index, dtype=object)
+
+
+def load_base_rates(rates=None):
+    """Return Base Rate as a price Series indexed by (vehicle type, customer, duty type)"""
+    if rates is None:
+        rates = load_reference("base_rates")
+    customer = rates[RATE_CUSTOMER_COL] if RATE_CUSTOMER_COL in rates.columns else ANY_CUSTOMER
+    table = pd.DataFrame({
+        "vehicle_key": normalize_key(rates[RATE_VEHICLE_COL]),
+        "customer_key": normalize_key(pd.Series(customer, index=rates.index)).replace("", ANY_CUSTOMER),
+        "duty_key": normalize_key(rates[RATE_DUTY_COL]),
+        "base_price": pd.to_numeric(rates[RATE_PRICE_COL], errors="coerce").astype("float64"),
+    }).dropna(subset=["base_price"])
+
+    duplicates = table.duplicated(["vehicle_key", "customer_key", "duty_key"], keep="last")
+    if duplicates.any():
+        print(f"  ⚠️ {int(duplicates.sum())} duplicate Base Rate keys after cleanup, keeping the last row")
+        table = table[~duplicates]
+
+    index = pd.MultiIndex.from_frame(table[["vehicle_key", "customer_key", "duty_key"]])
+    return pd.Series(table["base_price"].to_numpy(), index=index, name="base_price").sort_index()
+
+
+def _first_present(df, candidates):
+    for col in candidates:
+        if col in df.columns:
+            return col
+    return None
+
+
+def expected_charges(df_duties, base_rates):
+    """Look up the expected charge per duty (customer-specific rate first, then the generic one)"""
+    duty_col = _first_present(df_duties, DUTY_TYPE_CANDIDATES)
+    if duty_col is None:
+        raise KeyError(f"No duty package column found (tried {DUTY_TYPE_CANDIDATES})")
+
+    vehicle_key = normalize_key(df_duties[DUTY_VEHICLE_COL])
+    customer_key = normalize_key(df_duties[DUTY_CUSTOMER_COL]) if DUTY_CUSTOMER_COL in df_duties.columns else None
+    duty_key = normalize_key(df_duties[duty_col])
+
+    generic = pd.MultiIndex.from_arrays([vehicle_key, pd.Series(ANY_CUSTOMER, index=df_duties.index), duty_key])
+    expected = base_rates.reindex(generic).to_numpy()
+    if customer_key is not None:
+        specific = base_rates.reindex(pd.MultiIndex.from_arrays([vehicle_key, customer_key, duty_key])).to_numpy()
+        expected = np.where(np.isnan(specific), expected, specific)
+    return pd.Series(expected, index=df_duties.index, name="expected_charge")
+
+
+def billed_amounts(df_invoices):
+    """Invoiced amount per dutyId; an invoice repeated on every duty it covers is split evenly over them"""
+    amount_col = _first_present(df_invoices, INVOICE_AMOUNT_CANDIDATES)
+    if df_invoices.empty or amount_col is None:
+        return pd.Series(dtype="float64", name="billed_amount")
+    lines = pd.DataFrame({
+        "dutyId": df_invoices["dutyId"].astype(str),
+        "amount": pd.to_numeric(df_invoices[amount_col], errors="coerce"),
+    })
+    id_col = _first_present(df_invoices, INVOICE_ID_CANDIDATES)
+    if id_col is None:
+        return lines.groupby("dutyId")["amount"].sum().rename("billed_amount")
+    # lines without an invoice id stay separate invoices
+    ids = df_invoices[id_col]
+    lines["invoice"] = ids.astype(str).where(ids.notna(), "row:" + pd.Series(range(len(ids)), index=ids.index).astype(str))
+    lines = lines.drop_duplicates(["dutyId", "invoice"])
+    per_invoice = lines.groupby("invoice").agg(amount=("amount", "max"), duties=("dutyId", "nunique"))
+    share = lines["invoice"].map(per_invoice["amount"] / per_invoice["duties"])
+    return share.groupby(lines["dutyId"]).sum().rename("billed_amount")
+
+
+def price_duties(df_duties, df_invoices, base_rates):
+    """Expected vs billed charge per duty with a variance flag"""
+    out = pd.DataFrame({"dutyId": df_duties["dutyId"].astype(str)})
+    for col in (DUTY_CUSTOMER_COL, DUTY_VEHICLE_COL, _first_present(df_duties, DUTY_TYPE_CANDIDATES)):
+        if col in df_duties.columns:
+            out[col] = df_duties[col]
+    out["expected_charge"] = expected_charges(df_duties, base_rates)
+    out["billed_amount"] = out["dutyId"].map(billed_amounts(df_invoices))
+
+    out["variance"] = out["billed_amount"] - out["expected_charge"]
+    out["variance_pct"] = out["variance"] / out["expected_charge"] * 100
+    outside = (out["variance"].abs() > VARIANCE_ABS_LIMIT) & (out["variance_pct"].abs() > VARIANCE_PCT_LIMIT)
+
+    out["flag"] = np.select(
+        [
+            out["expected_charge"].isna(),
+            out["billed_amount"].isna(),
+            outside & (out["variance"] < 0),
+            outside & (out["variance"] > 0),
+        ],
+        ["NO RATE", "NOT BILLED", "UNDER", "OVER"],
+        default="OK",
+    )
+    return out
+
+
+if __name__ == "__main__":
+    start = time.time()
+    print("Loading Base Rate...")
+    base_rates = load_base_rates()
+    print(f"  {len(base_rates)} rate keys")
+
+    print("Reading billed duties/invoices from the local store...")
+    df_duties = query("SELECT * FROM billed_duties")
+    df_invoices = query("SELECT * FROM billed_invoices")
+
+    print(f"Pricing {len(df_duties)} duties...")
+    priced = price_duties(df_duties, df_invoices, base_rates)
+    print(priced["flag"].value_counts().to_string())
+
+    save_table("pricing_variances", priced)
+    excel_ready(priced).to_excel(ONEDRIVE_PATH, index=False, engine="openpyxl")
+    print(f"\n✅ Saved pricing variances for {len(priced)} duties to: {ONEDRIVE_PATH} ({time.time() - start:.1f}s)")
@@ -0,0 +1,64 @@
+import sys
+import json
+import time
+
+import fast_json
+from bench_normalize import synthetic_billed_history
+
+# === Decode microbenchmark over duty page payloads ===
+PAGE_SIZE = 1000        # duties per page, as billed.py requests
+SYNTHETIC_PAGES = 20
+REPEATS = 5
+
+
+def load_payloads(paths):
+    """Recorded page payloads (raw response bodies saved as .json files)"""
+    payloads = []
+    for path in paths:
+        with open(path, "rb") as f:
+            payloads.append(f.read())
+    return payloads
+
+
+def synthetic_payloads(pages=SYNTHETIC_PAGES):
+    duties = synthetic_billed_history(pages * PAGE_SIZE)
+    return [
+        json.dumps({"data": duties[i:i + PAGE_SIZE]}).encode("utf-8")
+        for i in range(0, len(duties), PAGE_SIZE)
+    ]
+
+
+def time_decoder(decode, payloads):
+    """Best-of-REPEATS seconds to decode every payload once"""
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for payload in payloads:
+            decode(payload)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    payloads = load_payloads(sys.argv[1:]) if len(sys.argv) > 1 else synthetic_payloads()
+    megabytes = sum(len(p) for p in payloads) / (1024 * 1024)
+    source = "recorded" if len(sys.argv) > 1 else "synthetic"
+    print(f"{len(payloads)} {source} pages, {megabytes:.1f} MB total (fast backend: {fast_json.BACKEND})\n")
+
+    decoders = {
+        "response.json() (bytes -> str -> json)": lambda b: json.loads(b.decode("utf-8")),
+        "json.loads(bytes)": json.loads,
+        f"fast_json.loads ({fast_json.BACKEND})": fast_json.loads,
+    }
+    baseline = None
+    for name, decode in decoders.items():
+        seconds = time_decoder(decode, payloads)
+        baseline = baseline or seconds
+        print(f"{name:<42} {seconds * 1000 / megabytes:8.2f} ms/MB  {baseline / seconds:5.2f}x")
+
+    body = {"criteria": "billed", "dateRange": {"start": "2024-04-01T00:00:00.000+05:30"}, "page": 1, "limit": PAGE_SIZE}
+    start = time.perf_counter()
+    for _ in range(100000):
+        fast_json.dumps(body)
+    print(f"\nfast_json.dumps request body: {(time.perf_counter() - start) * 10:.2f} µs")
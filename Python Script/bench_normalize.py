@@ -0,0 +1,100 @@
+import sys
+import time
+import pickle
+import random
+from datetime import datetime, timedelta
+
+from parallel_normalize import BATCH_SIZE, normalize_duties, normalize_duty_batch
+
+# === Synthetic billed history ===
+DEFAULT_DUTIES = 200000
+WORKER_COUNTS = [1, 2, 4, 8]
+VEHICLE_TYPES = ["DZIRE", "TOYOTA CRYSTA", "HONDA CITY / CIAZ", "FORTUNER", "KIA CARENS"]
+DUTY_TYPES = ["4Hour-40Km", "8Hour-80Km", "12Hour-120Km", "AIRPORT PICK & DROP", "250 OUT STATION"]
+
+
+def synthetic_billed_history(count, seed=42):
+    """Duties shaped like the /duties 'billed' payload (nested dicts + invoice lists)"""
+    rng = random.Random(seed)
+    start = datetime(2022, 4, 1, 6, 0)
+    fmt = "%Y-%m-%dT%H:%M:%S.000+05:30"
+    duties = []
+    for i in range(count):
+        pick_up = start + timedelta(minutes=rng.randint(0, 60 * 24 * 1300))
+        drop_off = pick_up + timedelta(hours=rng.randint(2, 14))
+        duties.append({
+            "dutyId": f"D{i:08d}",
+            "status": "billed",
+            "customer": {"id": f"C{rng.randint(1, 450)}", "name": f"Customer {rng.randint(1, 450)}"},
+            "vehicle": {"number": f"DL1C{rng.randint(1000, 1250)}", "type": rng.choice(VEHICLE_TYPES)},
+            "vehicleId": f"V{rng.randint(1, 250)}",
+            "driverId": f"DR{rng.randint(1, 100)}",
+            "dutyType": rng.choice(DUTY_TYPES),
+            "pickUpTime": pick_up.strftime(fmt),
+            "dropOffTime": drop_off.strftime(fmt),
+            "dutySlip": {
+                "startDate": pick_up.strftime(fmt),
+                "endDate": drop_off.strftime(fmt),
+                "startKm": rng.randint(1000, 150000),
+                "totalKm": rng.randint(10, 450),
+            },
+            "passengers": [{"name": "Guest", "phone": "9999999999"}],
+            "invoices": [
+                {
+                    "id": f"I{i:08d}-{n}",
+                    "invoiceNumber": f"HT/{i}/{n}",
+                    "amount": round(rng.uniform(800, 15000), 2),
+                    "date": drop_off.strftime(fmt),
+                }
+                for n in range(rng.choice([1, 1, 1, 2]))
+            ],
+        })
+    return duties
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def cost_breakdown(duties):
+    """Where pooled time goes, measured in-process (valid on any core count).
+
+    The parent pickles every duty out and unpickles every frame back, one after another;
+    that share bounds the pool's speedup however many cores there are.
+    """
+    protocol = pickle.HIGHEST_PROTOCOL
+    frames, serial = _timed(normalize_duty_batch, duties)
+    sent, pickle_out = _timed(pickle.dumps, duties, protocol)
+    returned = pickle.dumps(frames, protocol)
+    _, unpickle_back = _timed(pickle.loads, returned)
+    _, worker_in = _timed(pickle.loads, sent)
+    _, worker_out = _timed(pickle.dumps, frames, protocol)
+    parent = pickle_out + unpickle_back
+    worker = worker_in + serial + worker_out
+    print(f"\nin-process normalize: {serial:.2f}s")
+    print(f"parent pickling:      {parent:.2f}s (out {pickle_out:.2f}s + back {unpickle_back:.2f}s)")
+    print(f"worker total work:    {worker:.2f}s (unpickle + normalize + pickle), split over the workers")
+    for workers in WORKER_COUNTS[1:]:
+        bound = max(parent, worker / workers)
+        print(f"  {workers} workers: at best {bound:.2f}s ({serial / bound:.2f}x) before process start-up")
+
+
+# === Example usage: python bench_normalize.py [duties] [--costs] ===
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else DEFAULT_DUTIES
+    print(f"Generating {count} synthetic billed duties...")
+    duties = synthetic_billed_history(count)
+    if "--costs" in sys.argv:
+        cost_breakdown(duties)
+        sys.exit(0)
+
+    baseline = None
+    print(f"\n{'workers':>8} {'seconds':>9} {'speedup':>8} {'duty rows':>10} {'invoice rows':>13}")
+    for workers in WORKER_COUNTS:
+        start = time.perf_counter()
+        df_duties, df_invoices = normalize_duties(duties, workers=workers, batch_size=BATCH_SIZE, force=True)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x {len(df_duties):>10} {len(df_invoices):>13}")
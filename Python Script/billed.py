@@ -1,11 +1,22 @@
-import requests
-import json
 import time
-import pandas as pd
 from datetime import datetime, timedelta
+import fast_json
+from lazy_imports import LazyModule
+
+# heavy dependencies load on first use
+requests = LazyModule("requests")
 
 # === Import auth handler ===
 from auth_refresh import get_auth_headers   # 👈 uses your existing auth_refresh.py
+from compact_types import compact_dataframe, report_memory, DUTY_SCHEMA, INVOICE_SCHEMA
+from ist_dates import parse_timestamps
+from data_quality import gate
+from local_store import save_table
+from arrow_outputs import write_arrow
+from month_partitions import write_partitions
+from export_pool import ExportStage, sheet_chunks
+from page_archive import archive_page
+from parallel_normalize import normalize_duties
 
 # === API DETAILS ===
 API_URL = "https://app.indecab.com/api/beta/duties"
@@ -24,7 +35,7 @@ def get_api_data(headers, body, page=1, limit=1000):
         print(f"  Requesting page {page}...")
 
         try:
-            response = requests.post(API_URL, headers=headers, data=json.dumps(body_with_pagination), timeout=240)
+            response = requests.post(API_URL, headers=headers, data=fast_json.dumps(body_with_pagination), timeout=240)
         except requests.exceptions.Timeout:
             print("  Request timed out.")
             break
@@ -35,7 +46,7 @@ def get_api_data(headers, body, page=1, limit=1000):
         # 🔑 Handle token expiration
         if response.status_code == 401:
             print("  ⚠️ Token expired, refreshing...")
-            headers = get_auth_headers()
+            headers = get_auth_headers(force=True)
             continue
 
         if response.status_code != 200:
@@ -46,7 +57,7 @@ def get_api_data(headers, body, page=1, limit=1000):
             print(f"  Error fetching API (page {page}): {response.text}")
             break
 
-        result = response.json()
+        result = fast_json.decode_response(response)
         data_page = result.get("data", [])
         print(f"  Received {len(data_page)} records on page {page}")
 
@@ -59,6 +70,7 @@ def get_api_data(headers, body, page=1, limit=1000):
             break
 
         all_data.extend(data_page)
+        archive_page("billed_duties", data_page, body["dateRange"]["start"])   # raw page, compressed + indexed
 
         if len(data_page) < limit:
             break
@@ -74,14 +86,6 @@ def daterange_chunks(start_date, end_date, chunk_days=3):
         yield current, chunk_end
         current = chunk_end + timedelta(days=1)
 
-def split_dataframe(df, max_rows=80000):
-    """Split DataFrame into list of smaller DataFrames each with <= max_rows"""
-    chunks = []
-    for start in range(0, len(df), max_rows):
-        end = start + max_rows
-        chunks.append(df.iloc[start:end])
-    return chunks
-
 if __name__ == "__main__":
     # === Always start from 2022-04-01 until today ===
     start_date = datetime.strptime("2022-04-01", "%Y-%m-%d")
@@ -114,44 +118,44 @@ if __name__ == "__main__":
         time.sleep(0.5)
 
     if all_results:
-        # === Flatten nested JSON into DataFrame ===
-        df_duties = pd.json_normalize(all_results)
-        df_duties.rename(columns={
-            "customer.name": "Customer Name",
-            "customer.id": "Customer ID",
-            "vehicle.number": "Vehicle Number",
-            "vehicle.type": "Vehicle Type",
-        }, inplace=True)
-
-        # === Extract invoices (nested lists) into separate DataFrame ===
-        invoices_records = []
-        for duty in all_results:
-            duty_id = duty.get("dutyId")
-            invoices = duty.get("invoices", [])
-            if isinstance(invoices, list):
-                for inv in invoices:
-                    inv_record = {"dutyId": duty_id}
-                    inv_record.update(inv)
-                    invoices_records.append(inv_record)
-
-        df_invoices = pd.DataFrame(invoices_records) if invoices_records else pd.DataFrame()
-
-        # === Write data to Excel in chunks ===
-        with pd.ExcelWriter(ONEDRIVE_PATH, engine="openpyxl") as writer:
-            # Split Duties sheet
-            duty_chunks = split_dataframe(df_duties, 80000)
-            for i, chunk in enumerate(duty_chunks, start=1):
-                sheet_name = f"Duties_{i}"
-                chunk.to_excel(writer, sheet_name=sheet_name, index=False)
-                print(f"✅ Wrote {len(chunk)} rows to sheet '{sheet_name}'")
-
-            # Split Invoices sheet
+        # === Flatten nested JSON + explode invoices (process pool only for large histories on 4+ cores) ===
+        df_duties, df_invoices = normalize_duties(all_results)
+
+        # Dedupe like dispatched.py (a duty repeated across pages would repeat its invoice lines too)
+        if "dutyId" in df_duties.columns:
+            df_duties = df_duties.drop_duplicates(subset=["dutyId"])
+        invoice_key = [c for c in ("dutyId", "id") if c in df_invoices.columns]
+        if invoice_key:
+            df_invoices = df_invoices.drop_duplicates(subset=invoice_key)
+
+        # === Apply typed schema (categoricals, downcast numerics, datetime64) ===
+        report_memory("Duties before typing", df_duties)
+        parse_timestamps(df_duties)
+        parse_timestamps(df_invoices)
+        compact_dataframe(df_duties, DUTY_SCHEMA)
+        compact_dataframe(df_invoices, INVOICE_SCHEMA)
+        report_memory("Duties after typing", df_duties)
+
+        # === Data-quality gate: stop bad batches before any export ===
+        gate("billed_duties", df_duties)
+        gate("billed_invoices", df_invoices)
+
+        # === Arrow copies first: the Excel worker maps its sheets from them ===
+        duties_arrow = write_arrow("billed_duties", df_duties)
+        invoices_arrow = write_arrow("billed_invoices", df_invoices)
+
+        with ExportStage() as exports:
+            # === Write data to Excel in 80k-row sheets (in a background process) ===
+            sheets = sheet_chunks("Duties", df_duties, duties_arrow)
             if not df_invoices.empty:
-                invoice_chunks = split_dataframe(df_invoices, 80000)
-                for i, chunk in enumerate(invoice_chunks, start=1):
-                    sheet_name = f"Invoices_{i}"
-                    chunk.to_excel(writer, sheet_name=sheet_name, index=False)
-                    print(f"✅ Wrote {len(chunk)} rows to sheet '{sheet_name}'")
+                sheets += sheet_chunks("Invoices", df_invoices, invoices_arrow)
+            exports.workbook(ONEDRIVE_PATH, sheets)
+
+            # === Local store + month partitions while the workbook is written ===
+            save_table("billed_duties", df_duties)
+            write_partitions("billed_duties", df_duties)
+            save_table("billed_invoices", df_invoices)
+            write_partitions("billed_invoices", df_invoices)
 
         print(f"\n✅ Saved {len(all_results)} billed duties to: {ONEDRIVE_PATH}")
     else:
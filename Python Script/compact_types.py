@@ -0,0 +1,179 @@
+import os
+import sys
+from lazy_imports import LazyModule
+from ist_dates import parse_timestamp_series, LOCAL_TZ
+
+# heavy dependencies load on first use
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# === Typed schema for flattened duty / invoice frames ===
+# Columns listed here are always typed this way; anything else is inferred
+# (low-cardinality strings -> category, numeric objects -> smallest safe dtype).
+DUTY_SCHEMA = {
+    "status": "category",
+    "Customer Name": "category",
+    "Customer ID": "category",
+    "Vehicle Number": "category",
+    "Vehicle Type": "category",
+    "vehicleId": "category",
+    "driverId": "category",
+    "pickUpTime": "datetime",
+    "dropOffTime": "datetime",
+    "dutySlip.startDate": "datetime",
+    "dutySlip.endDate": "datetime",
+}
+
+INVOICE_SCHEMA = {
+    "dutyId": "category",
+    "date": "datetime",
+    "dueDate": "datetime",
+    "createdAt": "datetime",
+}
+
+CATEGORY_MAX_RATIO = 0.5      # convert when unique values <= 50% of rows
+FLOAT32_DECIMALS = 2          # float32 only when every value comes back exactly after rounding to this
+DATETIME_SUFFIXES = ("Time", "Date", "At")
+# money columns stay float64: float32 sums drift even when each value rounds back fine
+MONEY_HINTS = ("amount", "price", "balance", "cost", "total", "tax", "rate", "fare", "charge", "due", "paid")
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB (None if unknown)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS reports bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def current_rss_mb():
+    """Return the current resident set size of this process in MB (None if unknown)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:   # Linux: second field is resident pages
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def frame_memory_mb(df):
+    """Deep memory footprint of a DataFrame in MB"""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def report_memory(label, df):
+    """Print frame size, current RSS (can drop after compaction) and peak RSS (never drops)"""
+    rss, peak = current_rss_mb(), peak_rss_mb()
+    rss_str = f"{rss:.1f} MB" if rss is not None else "n/a"
+    peak_str = f"{peak:.1f} MB" if peak is not None else "n/a"
+    print(f"  📏 {label}: frame {frame_memory_mb(df):.1f} MB, RSS {rss_str} (peak {peak_str})")
+
+
+def _is_hashable_column(series):
+    try:
+        series.nunique()
+        return True
+    except TypeError:   # lists / dicts left over from json_normalize
+        return False
+
+
+def _to_datetime(series):
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return series.dt.tz_convert(LOCAL_TZ)
+    return parse_timestamp_series(series)
+
+
+def _is_money(name):
+    return any(hint in str(name).lower() for hint in MONEY_HINTS)
+
+
+def _downcast_numeric(series, name=None):
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy(dtype="float64", na_value=np.nan)
+        finite = values[~np.isnan(values)]
+        if finite.size and np.array_equal(finite, np.round(finite)) and np.abs(finite).max() < 2**31:
+            if finite.size == values.size:
+                return series.astype("int32")
+            return series.astype("Int32")
+        if _is_money(name):
+            return series
+        widened = np.round(finite.astype("float32").astype("float64"), FLOAT32_DECIMALS)
+        if np.array_equal(widened, finite):
+            return series.astype("float32")
+    return series
+
+
+def _infer_object(name, series):
+    non_null = series.dropna()
+    if non_null.empty:
+        return series
+    if name.endswith(DATETIME_SUFFIXES) and non_null.map(lambda v: isinstance(v, str)).all():
+        parsed = _to_datetime(series)
+        if parsed.notna().sum() == len(non_null):
+            return parsed
+    if non_null.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).all():
+        return _downcast_numeric(pd.to_numeric(series), name)
+    try:
+        unique = series.nunique()
+    except TypeError:   # lists / dicts left over from json_normalize
+        return series
+    if unique <= CATEGORY_MAX_RATIO * len(series):
+        return series.astype("category")
+    return series
+
+
+def compact_dataframe(df, schema=None):
+    """Apply the typed schema (plus inference for unlisted columns) in place and return df"""
+    schema = schema or {}
+    for col in df.columns:
+        series = df[col]
+        kind = schema.get(col)
+        try:
+            if kind == "datetime":
+                df[col] = _to_datetime(series)
+            elif kind == "category":
+                if _is_hashable_column(series):
+                    df[col] = series.astype("category")
+            elif pd.api.types.is_numeric_dtype(series):
+                df[col] = _downcast_numeric(series, col)
+            elif series.dtype == object or pd.api.types.is_string_dtype(series):
+                df[col] = _infer_object(col, series)
+        except (TypeError, ValueError) as e:
+            print(f"  ⚠️ Could not type column '{col}': {e}")
+    return df
+
+
+def widen_float32(series):
+    """float32 back to float64 with the digits it was downcast from (1251.31, not 1251.31005859375)"""
+    if series.dtype == "float32":
+        return series.astype("float64").round(FLOAT32_DECIMALS)
+    return series
+
+
+def excel_ready(df):
+    """Return a copy Excel can store (openpyxl rejects tz-aware datetimes; float32 is widened)"""
+    out = df.copy()
+    for col in out.columns:
+        if isinstance(out[col].dtype, pd.DatetimeTZDtype):
+            out[col] = out[col].dt.tz_localize(None)
+        else:
+            out[col] = widen_float32(out[col])
+    return out
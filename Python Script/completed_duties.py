@@ -1,11 +1,22 @@
-import requests
-import json
 import time
-import pandas as pd
 from datetime import datetime, timedelta
+import fast_json
+from lazy_imports import LazyModule
+
+# heavy dependencies load on first use
+requests = LazyModule("requests")
 
 # === Import auth handler ===
 from auth_refresh import get_auth_headers   # 👈 uses your existing auth_refresh.py
+from compact_types import compact_dataframe, report_memory, DUTY_SCHEMA, INVOICE_SCHEMA
+from ist_dates import parse_timestamps
+from data_quality import gate
+from local_store import save_table
+from arrow_outputs import write_arrow
+from month_partitions import write_partitions
+from export_pool import ExportStage, sheet_chunks
+from page_archive import archive_page
+from parallel_normalize import normalize_duties
 
 # === API DETAILS ===
 API_URL = "https://app.indecab.com/api/beta/duties"   # 👈 duties API endpoint
@@ -25,7 +36,7 @@ def get_api_data(headers, body, page=1, limit=100):
         print(f"  Requesting page {page}...")
 
         try:
-            response = requests.post(API_URL, headers=headers, data=json.dumps(body_with_pagination), timeout=45)
+            response = requests.post(API_URL, headers=headers, data=fast_json.dumps(body_with_pagination), timeout=45)
         except requests.exceptions.Timeout:
             print("  Request timed out.")
             break
@@ -36,7 +47,7 @@ def get_api_data(headers, body, page=1, limit=100):
         # 🔑 If unauthorized (token expired) → refresh and retry once
         if response.status_code == 401:
             print("  ⚠️ Token expired, refreshing...")
-            headers = get_auth_headers()
+            headers = get_auth_headers(force=True)
             continue
 
         if response.status_code != 200:
@@ -47,7 +58,7 @@ def get_api_data(headers, body, page=1, limit=100):
             print(f"Error fetching API (page {page}): {response.text}")
             break
 
-        result = response.json()
+        result = fast_json.decode_response(response)
         data_page = result.get("data", [])
 
         print(f"  Received {len(data_page)} records on page {page}")
@@ -61,6 +72,7 @@ def get_api_data(headers, body, page=1, limit=100):
             break
 
         all_data.extend(data_page)
+        archive_page("completed_duties", data_page, body["dateRange"]["start"])   # raw page, compressed + indexed
 
         if len(data_page) < limit:
             break
@@ -112,35 +124,44 @@ if __name__ == "__main__":
         time.sleep(1)  # avoid API rate limit
 
     if all_results:
-        # === Flatten nested JSON into DataFrame ===
-        df_duties = pd.json_normalize(all_results)
-
-        # Rename some useful columns
-        df_duties.rename(columns={
-            "customer.name": "Customer Name",
-            "customer.id": "Customer ID",
-            "vehicle.number": "Vehicle Number",
-            "vehicle.type": "Vehicle Type",
-        }, inplace=True)
-
-        # === Extract invoices (nested lists) into a separate sheet ===
-        invoices_records = []
-        for duty in all_results:
-            duty_id = duty.get("dutyId")
-            invoices = duty.get("invoices", [])
-            if isinstance(invoices, list):
-                for inv in invoices:
-                    inv_record = {"dutyId": duty_id}
-                    inv_record.update(inv)  # merge invoice fields
-                    invoices_records.append(inv_record)
-
-        df_invoices = pd.DataFrame(invoices_records) if invoices_records else pd.DataFrame()
-
-        # === Save both sheets into Excel ===
-        with pd.ExcelWriter(ONEDRIVE_PATH, engine="openpyxl") as writer:
-            df_duties.to_excel(writer, sheet_name="Duties", index=False)
+        # === Flatten nested JSON + explode invoices (process pool only for large histories on 4+ cores) ===
+        df_duties, df_invoices = normalize_duties(all_results)
+
+        # Dedupe like dispatched.py (a duty repeated across pages would repeat its invoice lines too)
+        if "dutyId" in df_duties.columns:
+            df_duties = df_duties.drop_duplicates(subset=["dutyId"])
+        invoice_key = [c for c in ("dutyId", "id") if c in df_invoices.columns]
+        if invoice_key:
+            df_invoices = df_invoices.drop_duplicates(subset=invoice_key)
+
+        # === Apply typed schema (categoricals, downcast numerics, datetime64) ===
+        report_memory("Duties before typing", df_duties)
+        parse_timestamps(df_duties)
+        parse_timestamps(df_invoices)
+        compact_dataframe(df_duties, DUTY_SCHEMA)
+        compact_dataframe(df_invoices, INVOICE_SCHEMA)
+        report_memory("Duties after typing", df_duties)
+
+        # === Data-quality gate: stop bad batches before any export ===
+        gate("completed_duties", df_duties)
+        gate("completed_invoices", df_invoices)
+
+        # === Arrow copies first: the Excel worker maps its sheets from them ===
+        duties_arrow = write_arrow("completed_duties", df_duties)
+        invoices_arrow = write_arrow("completed_invoices", df_invoices)
+
+        with ExportStage() as exports:
+            # === Save both sheets into Excel (in a background process) ===
+            sheets = sheet_chunks("Duties", df_duties, duties_arrow, numbered=False)
             if not df_invoices.empty:
-                df_invoices.to_excel(writer, sheet_name="Invoices", index=False)
+                sheets += sheet_chunks("Invoices", df_invoices, invoices_arrow, numbered=False)
+            exports.workbook(ONEDRIVE_PATH, sheets)
+
+            # === Local store + month partitions while the workbook is written ===
+            save_table("completed_duties", df_duties)
+            write_partitions("completed_duties", df_duties)
+            save_table("completed_invoices", df_invoices)
+            write_partitions("completed_invoices", df_invoices)
 
         print(f"\n✅ Saved {len(all_results)} duties (completed) to OneDrive: {ONEDRIVE_PATH}")
     else:
@@ -0,0 +1,187 @@
+import sys
+import time
+from lazy_imports import LazyModule
+
+from ist_dates import LOCAL_TZ
+from local_store import append_table, connect, load_table, table_columns
+from master_history import history_table
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
+
+# === Column-wise data-quality gates run on each batch before it is exported ===
+# every check warns on any failing row and fails the batch above its error rate
+NULL_ERROR_RATE = 0.01       # required columns: more than 1% nulls stops the batch
+DUPLICATE_ERROR_RATE = 0.001
+BAD_DATE_ERROR_RATE = 0.001
+NEGATIVE_ERROR_RATE = 0.01
+FK_WARN_COVERAGE = 0.95      # share of ids found in the master (masters can lag a day)
+FK_ERROR_COVERAGE = 0.50     # below this the join key itself is wrong
+EARLIEST_DATE = "2015-01-01"
+LATEST_DAYS_AHEAD = 400
+LOG_TABLE = "data_quality_log"
+
+KEY_CANDIDATES = ["dutyId", "_id", "id", "invoiceNumber"]
+AMOUNT_CANDIDATES = ["amount", "totalAmount", "grandTotal", "total", "cost"]
+DUTY_MASTERS = {"vehicleId": "vehicles", "driverId": "drivers", "supplierId": "suppliers"}
+INVOICE_LINE_KEYS = [("dutyId", "id"), ("dutyId", "invoiceNumber")]   # one invoice covers several duties
+
+# entity -> key (first candidate whose columns are all present), required columns, amount check, foreign keys
+ENTITY_RULES = {
+    "billed_duties": {"key": ["dutyId"], "required": ["dutyId", "pickUpTime"], "masters": DUTY_MASTERS},
+    "completed_duties": {"key": ["dutyId"], "required": ["dutyId", "pickUpTime"], "masters": DUTY_MASTERS},
+    "dispatched": {"key": ["dutyId"], "required": ["dutyId", "pickUpTime"], "masters": DUTY_MASTERS},
+    # driverId / supplierId hold names here (extract_required_fields), so no master lookup
+    "dispatched_total": {"key": ["dutyId"], "required": ["dutyId", "pickUpTime"]},
+    "billed_invoices": {"key": INVOICE_LINE_KEYS, "required": ["dutyId"], "amounts": True},
+    "completed_invoices": {"key": INVOICE_LINE_KEYS, "required": ["dutyId"], "amounts": True},
+    "paid_invoices": {"key": KEY_CANDIDATES[1:], "amounts": True},
+    "unpaid_invoices": {"key": KEY_CANDIDATES[1:], "amounts": True},
+    "receipts": {"key": KEY_CANDIDATES[1:], "amounts": True},
+    "credit_notes": {"key": KEY_CANDIDATES[1:], "amounts": True},
+    "vehicle_fuels": {"key": ["_id", "id"], "amounts": True, "masters": {"vehicleId": "vehicles"}},
+    "vehicle_expenses": {"key": ["_id", "id"], "amounts": True, "masters": {"vehicleId": "vehicles"}},
+    "drivers": {"key": ["_id"], "required": ["_id", "name"]},
+}
+
+_master_keys = {}   # master -> set of every key it has ever had (loaded once per process)
+
+
+def _first_present(df, candidates):
+    for col in candidates:
+        if col in df.columns:
+            return col
+    return None
+
+
+def _key_columns(df, candidates):
+    """First key candidate (a column or a tuple of columns) fully present in df"""
+    for candidate in candidates:
+        columns = [candidate] if isinstance(candidate, str) else list(candidate)
+        if all(col in df.columns for col in columns):
+            return columns
+    return None
+
+
+def _finding(check, column, failing, total, error_rate=None, error=False):
+    rate = failing / total if total else 0.0
+    if error or (error_rate is not None and rate > error_rate):
+        severity = "error"
+    else:
+        severity = "warn"
+    return {"check": check, "column": column, "failing": int(failing), "rate": round(rate, 6), "severity": severity}
+
+
+def master_keys(master):
+    """Every business key a master has had (history, so old duties on retired vehicles still match)"""
+    if master not in _master_keys:
+        table = history_table(master)
+        conn = connect()
+        try:
+            if "entityKey" in table_columns(table, conn):
+                keys = {row[0] for row in conn.execute(f'SELECT DISTINCT "entityKey" FROM "{table}"')}
+            else:
+                keys = None
+        finally:
+            conn.close()
+        _master_keys[master] = keys
+    return _master_keys[master]
+
+
+def validate(entity, df):
+    """Vectorized checks over the whole batch; returns only the failing findings"""
+    rules = ENTITY_RULES.get(entity, {})
+    total = len(df)
+    findings = []
+
+    # completeness: required columns present and (almost) never null; fully-empty columns flag schema drift
+    null_counts = df.isna().sum()
+    for col in rules.get("required", []):
+        if col not in df.columns:
+            findings.append(_finding("missing_column", col, total, total, error=True))
+        elif null_counts[col]:
+            findings.append(_finding("nulls", col, null_counts[col], total, NULL_ERROR_RATE))
+    if total:
+        for col in null_counts.index[null_counts.to_numpy() == total]:
+            if col not in rules.get("required", []):
+                findings.append(_finding("all_null", col, total, total))
+
+    # uniqueness of the business key
+    key = _key_columns(df, rules.get("key", KEY_CANDIDATES))
+    if key is not None:
+        duplicates = int(df[key].dropna().duplicated().sum())
+        if duplicates > 0:
+            findings.append(_finding("duplicates", "+".join(key), duplicates, total, DUPLICATE_ERROR_RATE))
+
+    # parsed timestamps inside a plausible range
+    earliest = pd.Timestamp(EARLIEST_DATE, tz=LOCAL_TZ)
+    latest = pd.Timestamp.now(tz=LOCAL_TZ) + pd.Timedelta(days=LATEST_DAYS_AHEAD)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.DatetimeTZDtype):
+            values = df[col]
+            bad = int(((values < earliest) | (values > latest)).sum())
+            if bad:
+                findings.append(_finding("date_range", col, bad, total, BAD_DATE_ERROR_RATE))
+
+    # amounts should not be negative (credit notes carry positive amounts too)
+    if rules.get("amounts"):
+        amount = _first_present(df, AMOUNT_CANDIDATES)
+        if amount is not None:
+            negative = int((pd.to_numeric(df[amount], errors="coerce") < 0).sum())
+            if negative:
+                findings.append(_finding("negative_amount", amount, negative, total, NEGATIVE_ERROR_RATE))
+
+    # foreign-key coverage against the master histories
+    for col, master in rules.get("masters", {}).items():
+        if col not in df.columns:
+            continue
+        known = master_keys(master)
+        if not known:
+            continue
+        ids = df[col].dropna()
+        if ids.empty:
+            continue
+        # look up distinct ids only (as text, like the stored keys), then count their rows
+        unique_ids = pd.Series(ids.unique())
+        unknown = unique_ids[~unique_ids.astype(str).isin(known)]
+        missing = int(ids.isin(unknown).sum())
+        coverage = 1 - missing / len(ids)
+        if coverage < FK_WARN_COVERAGE:
+            findings.append(_finding(f"fk_{master}", col, missing, len(ids), error=coverage < FK_ERROR_COVERAGE))
+
+    return pd.DataFrame(findings, columns=["check", "column", "failing", "rate", "severity"])
+
+
+def gate(entity, df):
+    """Validate a batch, log the findings and raise before any export if an error-level check failed"""
+    if df is None or df.empty:
+        return None
+    start = time.time()
+    findings = validate(entity, df)
+    elapsed_ms = (time.time() - start) * 1000
+    if findings.empty:
+        print(f"  ✅ {entity}: {len(df)} rows passed data-quality checks ({elapsed_ms:.0f} ms)")
+        return findings
+
+    logged = findings.assign(entity=entity, rows=len(df), checkedAt=pd.Timestamp.now(tz=LOCAL_TZ))
+    append_table(LOG_TABLE, logged)
+    for f in findings.itertuples():
+        icon = "❌" if f.severity == "error" else "⚠️"
+        print(f"  {icon} {entity}.{f.column}: {f.check} on {f.failing} rows ({f.rate:.2%})")
+    errors = findings[findings["severity"] == "error"]
+    if not errors.empty:
+        raise ValueError(
+            f"{entity}: {len(errors)} data-quality check(s) failed — batch not exported: "
+            + ", ".join(f"{c}({col})" for c, col in zip(errors["check"], errors["column"]))
+        )
+    print(f"  {entity}: {len(findings)} warnings ({elapsed_ms:.0f} ms)")
+    return findings
+
+
+# === Example usage: python data_quality.py <table> (re-checks a stored table) ===
+if __name__ == "__main__":
+    entity = sys.argv[1] if len(sys.argv) > 1 else "billed_duties"
+    rows = load_table(entity)
+    if rows is None:
+        sys.exit(f"No '{entity}' table in the local store")
+    print(validate(entity, rows).to_string(index=False))
@@ -1,11 +1,23 @@
-import requests
-import json
 import time
-import pandas as pd
 from datetime import datetime, timedelta
+import fast_json
+from lazy_imports import LazyModule
+
+# heavy dependencies load on first use
+requests = LazyModule("requests")
+pd = LazyModule("pandas")
 
 # === Import auth handler ===
 from auth_refresh import get_auth_headers   # 👈 uses your existing auth_refresh.py
+from compact_types import excel_ready
+from ist_dates import parse_timestamps
+from data_quality import gate
+from local_store import save_table
+from arrow_outputs import write_arrow
+from page_archive import archive_page
+from stream_json import project_record, stream_projected
+from vehicle_utilization import export_utilization
+from double_booking import export_double_bookings
 
 # === API DETAILS ===
 API_URL = "https://app.indecab.com/api/beta/duties"   # 👈 duties API endpoint
@@ -13,9 +25,28 @@ API_URL = "https://app.indecab.com/api/beta/duties"   # 👈 duties API endpoint
 # === PATH TO SAVE FILE IN ONEDRIVE ===
 ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\dispatched.xlsx"
 
-
-def get_api_data(headers, body, page=1, limit=100):
-    """Fetch paginated API data with retries and long timeout"""
+# === Only these paths are parsed out of each duty (the rest is skipped while streaming) ===
+PROJECTED_FIELDS = [
+    "customer",
+    "vehicleId",
+    "pickUpTime",
+    "dropOffTime",
+    "dutySlip.startDate",
+    "dutySlip.endDate",
+    "status",
+    "dutyId",
+    "driverId",
+    "driverPhoneNumber",
+]
+
+
+def get_api_data(headers, body, page=1, limit=100, fields=None, strict=False, archive=True):
+    """Fetch paginated API data with retries and long timeout (fields = projection).
+
+    strict=True raises on a failed page instead of returning the partial result.
+    archive=True keeps every full page in the raw archive: pages are then decoded whole and
+    projected in memory; archive=False streams the projection and archives nothing.
+    """
     all_data = []
     last_page_data = None
     MAX_RETRIES = 3
@@ -32,8 +63,9 @@ def get_api_data(headers, body, page=1, limit=100):
                 response = requests.post(
                     API_URL,
                     headers=headers,
-                    data=json.dumps(body_with_pagination),
-                    timeout=60
+                    data=fast_json.dumps(body_with_pagination),
+                    timeout=60,
+                    stream=fields is not None and not archive
                 )
                 break
             except requests.exceptions.Timeout:
@@ -41,28 +73,39 @@ def get_api_data(headers, body, page=1, limit=100):
                 time.sleep(10)
         else:
             print("  ❌ Failed after multiple retries (timeout).")
+            if strict:
+                raise RuntimeError(f"Timed out on page {page}")
             break
 
-        if response.status_code == 401:
-            print("  ⚠️ Token expired, refreshing...")
-            headers = get_auth_headers()
-            continue
-
-        if response.status_code != 200:
-            if "rate limit" in (response.text or "").lower():
-                print("  Rate limit reached. Waiting 60 seconds before retrying...")
-                time.sleep(60)
+        with response:   # a streamed response holds its connection until closed
+            if response.status_code == 401:
+                print("  ⚠️ Token expired, refreshing...")
+                headers = get_auth_headers(force=True)
                 continue
-            print(f"  Error fetching API (page {page}): {response.text}")
-            break
 
-        try:
-            result = response.json()
-        except ValueError:
-            print("  ⚠️ Non-JSON response, stopping.")
-            break
+            if response.status_code != 200:
+                if "rate limit" in (response.text or "").lower():
+                    print("  Rate limit reached. Waiting 60 seconds before retrying...")
+                    time.sleep(60)
+                    continue
+                print(f"  Error fetching API (page {page}): {response.text}")
+                if strict:
+                    raise RuntimeError(f"HTTP {response.status_code} on page {page}")
+                break
+
+            try:
+                if fields and not archive:
+                    data_page = stream_projected(response, fields)
+                else:
+                    # the archive keeps the full page; only the projection is held across pages
+                    raw_page = fast_json.decode_response(response).get("data") or []
+                    data_page = [project_record(r, fields) for r in raw_page] if fields else raw_page
+            except ValueError:
+                print("  ⚠️ Non-JSON response, stopping.")
+                if strict:
+                    raise RuntimeError(f"Non-JSON response on page {page}")
+                break
 
-        data_page = result.get("data", [])
         print(f"  Received {len(data_page)} records on page {page}")
 
         if data_page == last_page_data:
@@ -74,6 +117,8 @@ def get_api_data(headers, body, page=1, limit=100):
             break
 
         all_data.extend(data_page)
+        if archive:
+            archive_page("dispatched", raw_page, body["dateRange"]["start"])   # raw page, compressed + indexed
 
         if len(data_page) < limit:
             break
@@ -113,7 +158,7 @@ if __name__ == "__main__":
             "dateRange": {"start": start_str, "end": end_str}
         }
 
-        data = get_api_data(HEADERS, body)
+        data = get_api_data(HEADERS, body, fields=PROJECTED_FIELDS)
         if data:
             all_results.extend(data)
         else:
@@ -133,6 +178,7 @@ if __name__ == "__main__":
             "customer": duty.get("customer"),
             "vehicleId": duty.get("vehicleId"),
             "pickUpTime": duty.get("pickUpTime"),
+            "dropOffTime": duty.get("dropOffTime"),
             "dutySlip.startDate": duty.get("dutySlip", {}).get("startDate") if isinstance(duty.get("dutySlip"), dict) else None,
             "dutySlip.endDate": duty.get("dutySlip", {}).get("endDate") if isinstance(duty.get("dutySlip"), dict) else None,
             "status": duty.get("status"),
@@ -148,9 +194,20 @@ if __name__ == "__main__":
     if "dutyId" in df.columns:
         df = df.drop_duplicates(subset=["dutyId"])
 
+    # Parse all timestamp columns once (IST) and add date keys
+    parse_timestamps(df)
+    gate("dispatched", df)
+
     # -------- Save to Excel --------
     print("\n💾 Writing to Excel...")
     with pd.ExcelWriter(ONEDRIVE_PATH, engine="openpyxl", mode="w") as writer:
-        df.to_excel(writer, sheet_name="Duties", index=False)
+        excel_ready(df).to_excel(writer, sheet_name="Duties", index=False)
+
+    save_table("dispatched", df)
+    write_arrow("dispatched", df)
+
+    # -------- Vehicle utilization (busy hours, idle gaps, daily %) --------
+    export_utilization(df)
+    export_double_bookings(df)
 
     print(f"\n✅ Saved {len(df)} duties (last 3 months) with 4 selected columns to OneDrive: {ONEDRIVE_PATH}")
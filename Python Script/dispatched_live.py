@@ -0,0 +1,160 @@
+import time
+import random
+from datetime import datetime, timedelta
+from lazy_imports import LazyModule
+
+from auth_refresh import get_auth_headers
+from arrow_outputs import write_arrow
+from dispatched import PROJECTED_FIELDS, get_api_data
+from ist_dates import parse_timestamps
+from local_store import append_table, load_table, save_table
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
+
+# === Live dispatched board: poll a short window, publish only what changed ===
+DAYS_BACK = 1            # yesterday's duties can still be running past midnight
+DAYS_AHEAD = 3
+POLL_SECONDS = 20
+POLL_JITTER = 5          # +/- seconds, so polls do not line up with other clients
+PAGE_LIMIT = 500         # one or two pages cover the whole window
+BOARD_TABLE = "dispatched_live"
+EVENT_TABLE = "dispatched_transitions"
+BOARD_COLUMNS = ["dutyId", "status", "customer", "vehicleId", "driverId", "driverPhoneNumber",
+                 "pickUpTime", "dropOffTime", "dutySlip.startDate", "dutySlip.endDate"]
+
+
+def live_window(now=None):
+    """(start, end) request strings covering DAYS_BACK .. DAYS_AHEAD around today"""
+    today = (now or datetime.today()).date()
+    start, end = today - timedelta(days=DAYS_BACK), today + timedelta(days=DAYS_AHEAD)
+    return start.strftime("%Y-%m-%dT00:00:00.000+05:30"), end.strftime("%Y-%m-%dT23:59:59.000+05:30")
+
+
+def _flatten(duty):
+    slip = duty.get("dutySlip") if isinstance(duty.get("dutySlip"), dict) else {}
+    record = {col: duty.get(col) for col in BOARD_COLUMNS if "." not in col}
+    record["dutySlip.startDate"] = slip.get("startDate")
+    record["dutySlip.endDate"] = slip.get("endDate")
+    if isinstance(record.get("customer"), dict):
+        record["customer"] = record["customer"].get("name")
+    return record
+
+
+def _in_window(pick_up, start, end):
+    """True when a raw pickUpTime string falls inside the polled window (string compare on the IST date)"""
+    return bool(pick_up) and start[:10] <= str(pick_up)[:10] <= end[:10]
+
+
+class LiveBoard:
+    """In-memory dutyId -> record state; diff() turns a fresh poll into status transitions"""
+
+    def __init__(self, records=None):
+        self.records = {r["dutyId"]: r for r in (records or []) if r.get("dutyId")}
+
+    @classmethod
+    def from_store(cls):
+        board = load_table(BOARD_TABLE)
+        if board is None or board.empty:
+            return cls()
+        # back to raw API strings so the first diff compares like with like
+        for col in board.columns:
+            if isinstance(board[col].dtype, pd.DatetimeTZDtype):
+                board[col] = board[col].dt.strftime("%Y-%m-%dT%H:%M:%S.%f").str[:23] + "+05:30"
+        board = board.astype(object).where(board.notna(), None)
+        return cls(board[[c for c in BOARD_COLUMNS if c in board.columns]].to_dict("records"))
+
+    def diff(self, polled, window):
+        """Apply one poll; returns (transition events, whether any board field changed)"""
+        start, end = window
+        fresh = {r["dutyId"]: r for r in polled if r.get("dutyId")}
+        events, changed = [], False
+
+        for duty_id, record in fresh.items():
+            old = self.records.get(duty_id)
+            if old is None:
+                events.append(self._event(record, None, record.get("status"), "new"))
+            elif old.get("status") != record.get("status"):
+                events.append(self._event(record, old.get("status"), record.get("status"), "status"))
+            changed = changed or old != record
+
+        for duty_id, old in self.records.items():
+            if duty_id in fresh:
+                continue
+            changed = True
+            # still inside the window but no longer returned: it left the dispatched state
+            if _in_window(old.get("pickUpTime"), start, end):
+                events.append(self._event(old, old.get("status"), None, "left"))
+
+        self.records = fresh
+        return events, changed
+
+    @staticmethod
+    def _event(record, from_status, to_status, change):
+        return {
+            "dutyId": record.get("dutyId"),
+            "change": change,
+            "fromStatus": from_status,
+            "toStatus": to_status,
+            "vehicleId": record.get("vehicleId"),
+            "driverId": record.get("driverId"),
+            "pickUpTime": record.get("pickUpTime"),
+            "observedAt": datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000+05:30"),
+        }
+
+    def frame(self):
+        df = pd.DataFrame(list(self.records.values()), columns=BOARD_COLUMNS)
+        parse_timestamps(df)
+        return df
+
+
+def publish(board, events):
+    """Append the transitions and replace the (small) live board table + Arrow copy"""
+    if events:
+        df_events = pd.DataFrame(events)
+        parse_timestamps(df_events)
+        append_table(EVENT_TABLE, df_events)
+    df_board = board.frame()
+    save_table(BOARD_TABLE, df_board)
+    write_arrow(BOARD_TABLE, df_board)
+
+
+def poll_once(board, headers):
+    window = live_window()
+    body = {"criteria": "dispatched", "dateRange": {"start": window[0], "end": window[1]}}
+    # strict: a failed page must not look like every duty left the board;
+    # archive=False: the 20 s polls re-fetch the same duties the snapshot run already archives
+    duties = get_api_data(headers, body, limit=PAGE_LIMIT, fields=PROJECTED_FIELDS, strict=True, archive=False) or []
+    previous = board.records
+    events, changed = board.diff([_flatten(d) for d in duties], window)
+    if changed:
+        try:
+            publish(board, events)
+        except Exception:
+            board.records = previous   # re-diff next poll so no transition is lost
+            raise
+    return events
+
+
+def run_live():
+    board = LiveBoard.from_store()
+    print(f"📡 Live dispatched feed: {len(board.records)} duties on the stored board, polling every ~{POLL_SECONDS}s")
+    while True:
+        start = time.time()
+        try:
+            events = poll_once(board, get_auth_headers())
+        except Exception as e:
+            print(f"  ⚠️ Poll failed: {e}")
+            events = []
+        for event in events:
+            print(f"  🔔 {event['dutyId']}: {event['fromStatus']} → {event['toStatus']} ({event['change']})")
+        elapsed = time.time() - start
+        time.sleep(max(1.0, POLL_SECONDS + random.uniform(-POLL_JITTER, POLL_JITTER) - elapsed))
+
+
+# === Example usage: python dispatched_live.py (Ctrl+C to stop) ===
+if __name__ == "__main__":
+    try:
+        run_live()
+    except KeyboardInterrupt:
+        print("\n⏹️ Live feed stopped.")
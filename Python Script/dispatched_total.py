@@ -1,11 +1,21 @@
-import requests
-import json
 import time
-import pandas as pd
 from datetime import datetime, timedelta
+import fast_json
+from lazy_imports import LazyModule
+
+# heavy dependencies load on first use
+requests = LazyModule("requests")
+pd = LazyModule("pandas")
 
 # === Import auth handler ===
 from auth_refresh import get_auth_headers
+from compact_types import excel_ready
+from ist_dates import parse_timestamps
+from data_quality import gate
+from local_store import save_table
+from arrow_outputs import write_arrow
+from page_archive import archive_page
+from stream_json import project_record, stream_projected
 
 # === API DETAILS ===
 API_URL = "https://app.indecab.com/api/beta/duties"
@@ -13,9 +23,24 @@ API_URL = "https://app.indecab.com/api/beta/duties"
 # === PATH TO SAVE FILE IN ONEDRIVE ===
 ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\dispatched_total.xlsx"
 
+# === Only these paths are parsed out of each duty (the rest is skipped while streaming) ===
+PROJECTED_FIELDS = [
+    "dutyId",
+    "pickUpTime",
+    "dropOffTime",
+    "customer",
+    "driver",
+    "driverId",
+    "driverPhoneNumber",
+    "supplier",
+    "supplierId",
+    "supplierPhoneNumber",
+    "passengers",
+]
+
 
-def get_api_data(headers, body, page=1, limit=100):
-    """Fetch paginated API data"""
+def get_api_data(headers, body, page=1, limit=100, fields=None, archive=True):
+    """Fetch paginated API data (fields = projection; archive=False streams it and archives nothing)"""
     all_data = []
     last_page_data = None
 
@@ -29,28 +54,38 @@ def get_api_data(headers, body, page=1, limit=100):
             response = requests.post(
                 API_URL,
                 headers=headers,
-                data=json.dumps(body_with_pagination),
-                timeout=60
+                data=fast_json.dumps(body_with_pagination),
+                timeout=60,
+                stream=fields is not None and not archive
             )
         except requests.exceptions.Timeout:
             print("  ⏳ Request timed out.")
             break
 
-        if response.status_code == 401:
-            print("  ⚠️ Token expired, refreshing...")
-            headers = get_auth_headers()
-            continue
-
-        if response.status_code != 200:
-            if "rate limit" in response.text.lower():
-                print("  Rate limit reached. Waiting 60 seconds...")
-                time.sleep(60)
+        with response:   # a streamed response holds its connection until closed
+            if response.status_code == 401:
+                print("  ⚠️ Token expired, refreshing...")
+                headers = get_auth_headers(force=True)
                 continue
-            print(f"  Error fetching API: {response.text}")
-            break
 
-        result = response.json()
-        data_page = result.get("data", [])
+            if response.status_code != 200:
+                if "rate limit" in response.text.lower():
+                    print("  Rate limit reached. Waiting 60 seconds...")
+                    time.sleep(60)
+                    continue
+                print(f"  Error fetching API: {response.text}")
+                break
+
+            try:
+                if fields and not archive:
+                    data_page = stream_projected(response, fields)
+                else:
+                    # the archive keeps the full page; only the projection is held across pages
+                    raw_page = fast_json.decode_response(response).get("data") or []
+                    data_page = [project_record(r, fields) for r in raw_page] if fields else raw_page
+            except ValueError:
+                print("  ⚠️ Non-JSON response, stopping.")
+                break
         print(f"  Received {len(data_page)} records on page {page}")
 
         if data_page == last_page_data:
@@ -62,6 +97,8 @@ def get_api_data(headers, body, page=1, limit=100):
             break
 
         all_data.extend(data_page)
+        if archive:
+            archive_page("dispatched_total", raw_page, body["dateRange"]["start"])   # raw page, compressed + indexed
 
         if len(data_page) < limit:
             break
@@ -136,12 +173,6 @@ def extract_required_fields(duty_data):
             else:
                 duty_info["passengers"] = None
             
-            # Debug: Print first record to verify structure
-            if idx == 0:
-                print(f"\n  First record structure:")
-                for key, value in duty_info.items():
-                    print(f"    {key}: {value} (type: {type(value).__name__})")
-            
             extracted_data.append(duty_info)
             
         except Exception as e:
@@ -185,7 +216,7 @@ if __name__ == "__main__":
             }
         }
 
-        data = get_api_data(HEADERS, body)
+        data = get_api_data(HEADERS, body, fields=PROJECTED_FIELDS)
         if data:
             all_results.extend(data)
 
@@ -198,18 +229,6 @@ if __name__ == "__main__":
     # === EXTRACT ONLY REQUIRED FIELDS ===
     print(f"\n🔧 Extracting required fields from {len(all_results)} records...")
     
-    # Debug: Show structure of first few records
-    print("\n📋 First duty record structure (keys only):")
-    if all_results and len(all_results) > 0:
-        first_duty = all_results[0]
-        print(f"  Keys: {list(first_duty.keys())}")
-        print(f"  Customer type: {type(first_duty.get('customer')).__name__}")
-        print(f"  Driver type: {type(first_duty.get('driver')).__name__}")
-        print(f"  Supplier type: {type(first_duty.get('supplier')).__name__}")
-        print(f"  Passengers type: {type(first_duty.get('passengers')).__name__}")
-        if first_duty.get('passengers'):
-            print(f"  Passengers sample: {first_duty.get('passengers')[:100] if isinstance(first_duty.get('passengers'), str) else first_duty.get('passengers')}")
-    
     extracted_data = extract_required_fields(all_results)
     
     if not extracted_data:
@@ -259,12 +278,20 @@ if __name__ == "__main__":
     if len(final_df) == 0:
         print("\n❌ No data to save to Excel.")
         raise SystemExit()
+
+    # Parse pickUpTime / dropOffTime once (IST) and add date keys
+    parse_timestamps(final_df)
+    gate("dispatched_total", final_df)
     
+    # === LOAD INTO LOCAL STORE ===
+    save_table("dispatched_total", final_df)
+    write_arrow("dispatched_total", final_df)
+
     print(f"\n💾 Writing {len(final_df)} records to Excel...")
     
     try:
         with pd.ExcelWriter(ONEDRIVE_PATH, engine="openpyxl") as writer:
-            final_df.to_excel(writer, sheet_name="Duties", index=False)
+            excel_ready(final_df).to_excel(writer, sheet_name="Duties", index=False)
         
         print(f"\n✅ Successfully saved to OneDrive:")
         print(f"   File: {ONEDRIVE_PATH}")
@@ -283,11 +310,11 @@ if __name__ == "__main__":
         
         # Try alternative save method
         try:
-            final_df.to_excel(ONEDRIVE_PATH, index=False, engine='openpyxl')
+            excel_ready(final_df).to_excel(ONEDRIVE_PATH, index=False, engine='openpyxl')
             print(f"   File saved using alternative method")
         except Exception as e2:
             print(f"   Failed to save: {e2}")
             # Save as CSV as last resort
             csv_path = ONEDRIVE_PATH.replace('.xlsx', '.csv')
-            final_df.to_csv(csv_path, index=False)
+            excel_ready(final_df).to_csv(csv_path, index=False)
             print(f"   Saved as CSV instead: {csv_path}")
\ No newline at end of file
@@ -0,0 +1,98 @@
+import time
+import heapq
+from lazy_imports import LazyModule
+
+from compact_types import excel_ready
+from ist_dates import LOCAL_TZ
+from local_store import load_table, save_table
+from vehicle_utilization import END_COLUMNS, to_epoch_seconds
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
+
+# === PATH TO SAVE FILE IN ONEDRIVE ===
+ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\double_bookings.xlsx"
+
+RESOURCES = {"driver": "driverId", "vehicle": "vehicleId"}
+DUTY_COLUMNS = ["dutyId", "vehicleId", "driverId", "pickUpTime", "dropOffTime", "dutySlip.endDate"]
+HISTORY_TABLE = "completed_duties"
+
+
+def duty_windows(df):
+    """dutyId / driverId / vehicleId with epoch-second start and end (end falls back to dutySlip.endDate)"""
+    end = None
+    for col in END_COLUMNS:
+        if col in df.columns:
+            end = df[col] if end is None else end.fillna(df[col])
+    windows = pd.DataFrame({
+        "dutyId": df["dutyId"].astype(object),
+        "start": to_epoch_seconds(df["pickUpTime"]).to_numpy(dtype="float64"),
+        "end": to_epoch_seconds(end).to_numpy(dtype="float64"),
+    })
+    for col in RESOURCES.values():
+        windows[col] = df[col].astype(object) if col in df.columns else None
+    windows = windows.dropna(subset=["dutyId", "start", "end"])
+    return windows[windows["end"] > windows["start"]]
+
+
+def sweep_overlaps(windows, resource_col):
+    """Every pair of duties on the same resource whose windows overlap.
+
+    Duties are sorted once by (resource, start); a min-heap of active end times
+    per resource drops finished duties, and each new duty conflicts with all
+    duties still active. O(n log n + conflicts).
+    """
+    frame = windows.dropna(subset=[resource_col]).sort_values([resource_col, "start", "end"])
+    resources = frame[resource_col].tolist()
+    starts = frame["start"].tolist()
+    ends = frame["end"].tolist()
+    duty_ids = frame["dutyId"].tolist()
+
+    conflicts = []
+    active = []           # heap of (end, row position)
+    current = None
+    for i, resource in enumerate(resources):
+        if resource != current:
+            current, active = resource, []
+        start = starts[i]
+        while active and active[0][0] <= start:   # back-to-back duties are not a conflict
+            heapq.heappop(active)
+        for other_end, j in active:
+            conflicts.append((resource, duty_ids[j], duty_ids[i], starts[j], other_end, start, ends[i]))
+        heapq.heappush(active, (ends[i], i))
+    return conflicts
+
+
+def find_double_bookings(*frames):
+    """Overlapping assignments per driver and vehicle across the given duty frames"""
+    parts = [duty_windows(df) for df in frames if df is not None and not df.empty]
+    rows = []
+    if parts:   # a quiet day can leave every frame empty
+        windows = pd.concat(parts, ignore_index=True).drop_duplicates("dutyId", keep="first")
+        for resource_type, col in RESOURCES.items():
+            rows.extend((resource_type, *conflict) for conflict in sweep_overlaps(windows, col))
+
+    result = pd.DataFrame(rows, columns=[
+        "resource_type", "resource_id", "dutyId_a", "dutyId_b", "a_start", "a_end", "b_start", "b_end",
+    ])
+    result["overlap_minutes"] = ((result[["a_end", "b_end"]].min(axis=1) - result["b_start"]) / 60).round(1)
+    for col in ["a_start", "a_end", "b_start", "b_end"]:
+        result[col] = pd.to_datetime(result[col], unit="s", utc=True).dt.tz_convert(LOCAL_TZ)
+    return result
+
+
+def export_double_bookings(df_dispatched):
+    """Check freshly synced dispatched duties together with the completed history in the store"""
+    start = time.time()
+    history = load_table(HISTORY_TABLE, DUTY_COLUMNS)
+    conflicts = find_double_bookings(df_dispatched, history)
+    print(f"\n🚨 Double bookings: {len(conflicts)} overlaps "
+          f"({(conflicts['resource_type'] == 'driver').sum()} driver, "
+          f"{(conflicts['resource_type'] == 'vehicle').sum()} vehicle) in {time.time() - start:.2f}s")
+    save_table("double_bookings", conflicts)
+    excel_ready(conflicts).to_excel(ONEDRIVE_PATH, index=False, engine="openpyxl")
+    return conflicts
+
+
+if __name__ == "__main__":
+    export_double_bookings(load_table("dispatched", DUTY_COLUMNS))
@@ -1,83 +1,24 @@
-import requests
-import time
-import pandas as pd
+import sys
+from lazy_imports import LazyModule
 from auth_refresh import get_auth_headers  # your token fetcher
+from master_fetch import fetch_master
+from master_history import record_versions
+from data_quality import gate
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
 
 API_URL = "https://app.indecab.com/api/beta/drivers"
 ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\drivers.xlsx"
 
 
-def get_api_data(headers, limit=1000, sleep_between_pages=0.2):
-    all_data = []
-    page = 1
-    total_expected = None
-    MAX_RETRIES = 3
-
-    while True:
-        params = {"page": page, "limit": limit}
-        print(f"Requesting page {page} (limit={limit})...")
-        response = None
-
-        for attempt in range(MAX_RETRIES):
-            try:
-                response = requests.get(
-                    API_URL,
-                    headers=headers,
-                    params=params,
-                    timeout=60
-                )
-                break
-            except requests.exceptions.Timeout:
-                print(f"  Timeout attempt {attempt + 1}/{MAX_RETRIES} — retrying...")
-                time.sleep(5)
-
-        if response is None:
-            print("  Failed to get response after retries.")
-            break
-
-        if response.status_code != 200:
-            print(f"  Error {response.status_code}: {response.text[:500]}")
-            break
-
-        try:
-            result = response.json()
-        except ValueError:
-            print("  Non-JSON response, stopping.")
-            break
-
-        data_page = result.get("data") or []
-        meta = result.get("meta") or {}
-
-        if total_expected is None:
-            total_expected = meta.get("total")
-
-        print(
-            f"  Received {len(data_page)} records on page {page} — "
-            f"collected so far: {len(all_data) + len(data_page)} "
-            f"(meta.total={total_expected})"
-        )
-
-        all_data.extend(data_page)
-
-        if total_expected and len(all_data) >= int(total_expected):
-            print(f"  ✅ Reached meta.total ({total_expected}). Stopping pagination.")
-            break
-
-        if len(data_page) < limit:
-            print("  ✅ Last page detected (less than limit). Stopping pagination.")
-            break
-
-        page += 1
-        time.sleep(sleep_between_pages)
-
-    return all_data, total_expected
-
-
 if __name__ == "__main__":
     headers = get_auth_headers()
     print("Fetching all drivers (full export)...")
 
-    all_data, total_expected = get_api_data(headers, limit=1000)
+    all_data, total_expected = fetch_master("drivers", API_URL, headers, force="--full" in sys.argv)
+    if all_data is None:
+        raise SystemExit(0)   # unchanged since the last run: history and exports are current
 
     if not all_data:
         print("No data returned.")
@@ -91,6 +32,7 @@ if __name__ == "__main__":
 
     # Required columns
     required_columns = [
+        "_id",          # business key for the driver history
         "name",
         "phone",
         "panCard",
@@ -118,9 +60,12 @@ if __name__ == "__main__":
     })
 
     print(f"Final dataset shape: {df_final.shape[0]} rows x {df_final.shape[1]} columns")
+    gate("drivers", df_final)   # stops before Excel / history if ids or names are missing
 
     # Write to Excel
     print(f"Writing to Excel: {ONEDRIVE_PATH}")
     df_final.to_excel(ONEDRIVE_PATH, index=False)
 
+    record_versions("drivers", df_final)   # SCD2: only new / changed records are written
+
     print("\n✅ Export finished successfully.")
@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from importlib.util import find_spec
+from lazy_imports import LazyModule
+
+from arrow_outputs import arrow_path
+from compact_types import excel_ready
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
+
+# optional, loaded on first use (pa.ipc comes with it)
+pa = LazyModule("pyarrow") if find_spec("pyarrow") is not None else None
+
+# === Export stage: independent workbooks serialized concurrently on a process pool ===
+EXCEL_MAX_ROWS = 80000     # rows per sheet, as billed.py always split them
+MAX_WORKERS = 4            # each openpyxl worker holds roughly one sheet in memory; keep the pool small
+
+# workbooks that can be rebuilt from the Arrow copies alone: path -> [(sheet prefix, arrow name, numbered)]
+WORKBOOKS = {
+    r"C:\Users\lenovo\OneDrive\API Call\billed_new.xlsx": [("Duties", "billed_duties", True), ("Invoices", "billed_invoices", True)],
+    r"C:\Users\lenovo\OneDrive\API Call\completed_duties.xlsx": [("Duties", "completed_duties", False), ("Invoices", "completed_invoices", False)],
+    r"C:\Users\lenovo\OneDrive\API Call\credit_notes.xlsx": [("Notes", "credit_notes", True)],
+    r"C:\Users\lenovo\OneDrive\API Call\receipts.xlsx": [("Receipts", "receipts", True)],
+    r"C:\Users\lenovo\OneDrive\API Call\dispatched.xlsx": [("Duties", "dispatched", False)],
+    r"C:\Users\lenovo\OneDrive\API Call\dispatched_total.xlsx": [("Duties", "dispatched_total", False)],
+    r"C:\Users\lenovo\OneDrive\API Call\paid_invoice.xlsx": [("Sheet1", "paid_invoices", False)],
+    r"C:\Users\lenovo\OneDrive\API Call\unpaid_invoice.xlsx": [("Sheet1", "unpaid_invoices", False)],
+}
+
+
+def _sheet_ranges(prefix, total, numbered=True, max_rows=EXCEL_MAX_ROWS):
+    if not numbered:
+        return [(prefix, 0, total)]
+    return [(f"{prefix}_{i}", start, min(start + max_rows, total))
+            for i, start in enumerate(range(0, total, max_rows), start=1)]
+
+
+def sheet_chunks(prefix, df, arrow_file=None, numbered=True, max_rows=EXCEL_MAX_ROWS):
+    """[(sheet name, source)] for df split into <prefix>_1..N sheets (or one <prefix> sheet).
+
+    With an Arrow copy of df, sources are (file, start, stop) slices so a worker maps only
+    its own rows instead of receiving a pickled frame.
+    """
+    return [
+        (name, (arrow_file, start, stop) if arrow_file else df.iloc[start:stop])
+        for name, start, stop in _sheet_ranges(prefix, len(df), numbered, max_rows)
+    ]
+
+
+def _materialize(source):
+    if isinstance(source, tuple):
+        path, start, stop = source
+        with pa.memory_map(path, "r") as mapped:
+            return pa.ipc.open_file(mapped).read_all().slice(start, stop - start).to_pandas()
+    return source
+
+
+def _source_rows(source):
+    return source[2] - source[1] if isinstance(source, tuple) else len(source)
+
+
+def write_workbook(path, sheets):
+    """Write [(sheet name, source)] into one workbook; returns (path, rows, seconds)"""
+    start = time.time()
+    rows = 0
+    tmp_path = path + ".tmp.xlsx"
+    with pd.ExcelWriter(tmp_path, engine="openpyxl") as writer:
+        for sheet_name, source in sheets:
+            df = _materialize(source)
+            excel_ready(df).to_excel(writer, sheet_name=sheet_name, index=False)
+            rows += len(df)
+            del df
+    os.replace(tmp_path, path)   # Power BI never picks up a half-written workbook
+    return path, rows, time.time() - start
+
+
+class ExportStage:
+    """Runs workbook writes in background processes while the caller keeps working.
+
+    At most `workers` workbooks are in flight (and so in memory) at once; queued jobs
+    start largest first, so the stage ends roughly when the largest workbook does.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = max(1, min(workers or os.cpu_count() or 1, MAX_WORKERS))
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.queue = []
+        self.running = {}
+        self.results = []
+
+    def workbook(self, path, sheets):
+        """Queue one workbook; it starts as soon as a worker is free"""
+        self.queue.append((path, sheets))
+        self.queue.sort(key=lambda job: sum(_source_rows(s) for _, s in job[1]), reverse=True)
+        self._fill()
+
+    def _fill(self):
+        while self.queue and len(self.running) < self.workers:
+            path, sheets = self.queue.pop(0)
+            self.running[self.pool.submit(write_workbook, path, sheets)] = path
+
+    def _collect(self, futures):
+        for future in futures:
+            path = self.running.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"  ❌ Export failed for {path}: {e}")
+                raise
+            self.results.append(result)
+            print(f"  📤 Wrote {result[1]} rows to {result[0]} ({result[2]:.1f}s)")
+
+    def wait(self):
+        """Block until every queued workbook is written"""
+        while self.queue or self.running:
+            self._fill()
+            done, _ = wait(list(self.running), return_when=FIRST_COMPLETED)
+            self._collect(done)
+        return self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.wait()
+        finally:
+            self.pool.shutdown(wait=exc_type is None, cancel_futures=True)
+        return False
+
+
+def export_from_arrow(paths=None, workers=None):
+    """Rebuild workbooks straight from the Arrow copies (every workbook in WORKBOOKS by default)"""
+    start = time.time()
+    with ExportStage(workers) as stage:
+        for path, layout in WORKBOOKS.items():
+            if paths and path not in paths:
+                continue
+            sheets = []
+            for prefix, name, numbered in layout:
+                file = arrow_path(name)
+                if not os.path.exists(file):
+                    continue
+                with pa.memory_map(file, "r") as mapped:
+                    rows = pa.ipc.open_file(mapped).read_all().num_rows
+                if rows == 0 and sheets:
+                    continue
+                sheets += [(sheet, (file, lo, hi)) for sheet, lo, hi in _sheet_ranges(prefix, rows, numbered)]
+            if sheets:
+                stage.workbook(path, sheets)
+    print(f"\n✅ Exported {len(stage.results)} workbooks on {stage.workers} processes in {time.time() - start:.1f}s")
+    return stage.results
+
+
+# === Example usage: python export_pool.py [workers] (re-exports every workbook from the Arrow copies) ===
+if __name__ == "__main__":
+    if pa is None:
+        sys.exit("pyarrow is required to export from the Arrow copies")
+    export_from_arrow(workers=int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,28 @@
+import json
+
+# === Fast JSON codec (orjson when installed, stdlib otherwise) ===
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps(obj):
+    """Serialize a request body to UTF-8 bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data):
+    """Parse JSON from bytes (or str); raises ValueError on bad input like response.json()"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_response(response):
+    """Decode a requests response straight from its raw bytes (no .text copy)"""
+    return loads(response.content)
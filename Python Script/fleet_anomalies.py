@@ -0,0 +1,154 @@
+import sys
+import time
+from lazy_imports import LazyModule
+
+from compact_types import excel_ready
+from local_store import append_table, load_table, save_table
+from vehicle_costs import (
+    AMOUNT_CANDIDATES, DATE_CANDIDATES, EXPENSE_TABLE, FUEL_TABLE, LITRES_CANDIDATES, VEHICLE_CANDIDATES,
+)
+
+# heavy dependencies load on first use
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# === PATH TO SAVE FILE IN ONEDRIVE ===
+ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\fleet_anomalies.xlsx"
+
+# === Rolling per-vehicle baselines ===
+WINDOW = 20            # previous entries per vehicle in the baseline
+MIN_HISTORY = 5        # no verdict until a vehicle has this many earlier entries
+FENCE = 3.0            # flag outside [q1 - FENCE*IQR, q3 + FENCE*IQR] of the baseline
+ID_CANDIDATES = ["_id", "id"]
+ODOMETER_CANDIDATES = ["odometer", "odometerReading", "currentKm", "km"]
+
+ANOMALY_TABLE = "fleet_anomalies"
+TAIL_TABLE = "fleet_anomaly_tail"     # last WINDOW + 1 entries per vehicle and stream
+
+
+def _first_present(df, candidates):
+    for col in candidates:
+        if col in df.columns:
+            return col
+    return None
+
+
+def stream_frame(df, stream):
+    """(stream, rowKey, vehicleId, date, raw measures) for fuel fills or expenses"""
+    vehicle, date = _first_present(df, VEHICLE_CANDIDATES), _first_present(df, DATE_CANDIDATES)
+    if vehicle is None or date is None:
+        raise KeyError(f"{stream} rows need a vehicle {VEHICLE_CANDIDATES} and a date {DATE_CANDIDATES}")
+    row_id = _first_present(df, ID_CANDIDATES)
+    frame = pd.DataFrame({
+        "stream": stream,
+        "rowKey": df[row_id].astype(str) if row_id else df.index.astype(str),
+        "vehicleId": df[vehicle].astype(str),
+        "date": df[date],
+    })
+    measures = {"amount": AMOUNT_CANDIDATES}
+    if stream == "fuel":
+        measures.update(litres=LITRES_CANDIDATES, odometer=ODOMETER_CANDIDATES)
+    for name, candidates in measures.items():
+        col = _first_present(df, candidates)
+        frame[name] = pd.to_numeric(df[col], errors="coerce") if col else np.nan
+    return frame.dropna(subset=["date"])
+
+
+def score(frame):
+    """Flag each entry against the rolling quartiles of the same vehicle's previous WINDOW entries"""
+    frame = frame.sort_values(["vehicleId", "date", "rowKey"], ignore_index=True)
+    by_vehicle = frame.groupby("vehicleId", sort=False)
+    metrics = ["amount"]
+    if "litres" in frame.columns:
+        frame["km_between_fills"] = by_vehicle["odometer"].diff()
+        metrics += ["litres", "km_between_fills"]
+
+    flagged = []
+    for metric in metrics:
+        # baseline = earlier entries only, so an outlier never hides itself
+        previous = by_vehicle[metric].shift()
+        rolling = previous.groupby(frame["vehicleId"], sort=False).rolling(WINDOW, min_periods=MIN_HISTORY)
+        q1 = rolling.quantile(0.25).droplevel(0).sort_index()
+        median = rolling.median().droplevel(0).sort_index()
+        q3 = rolling.quantile(0.75).droplevel(0).sort_index()
+        iqr = q3 - q1
+        low, high = q1 - FENCE * iqr, q3 + FENCE * iqr
+        value = frame[metric]
+        outlier = value.notna() & median.notna() & ((value < low) | (value > high))
+        if outlier.any():
+            hits = frame.loc[outlier, ["stream", "rowKey", "vehicleId", "date"]].copy()
+            hits["metric"] = metric
+            hits["value"] = value[outlier]
+            hits["baseline_median"] = median[outlier]
+            hits["low"] = low[outlier].round(2)
+            hits["high"] = high[outlier].round(2)
+            hits["direction"] = np.where(value[outlier] > high[outlier], "HIGH", "LOW")
+            flagged.append(hits)
+    if not flagged:
+        return pd.DataFrame(columns=["stream", "rowKey", "vehicleId", "date", "metric", "value",
+                                     "baseline_median", "low", "high", "direction"])
+    return pd.concat(flagged, ignore_index=True)
+
+
+def _tail(frame):
+    """Last WINDOW + 1 entries per vehicle: enough to rebuild every baseline and the next km gap"""
+    frame = frame.sort_values(["vehicleId", "date", "rowKey"])
+    return frame.groupby("vehicleId", sort=False).tail(WINDOW + 1).drop(columns=["km_between_fills"], errors="ignore")
+
+
+def screen(df, stream, full=False):
+    """Score only entries newer than their vehicle's watermark, using the stored per-vehicle tail.
+
+    Work per sync is O(new rows + vehicles x WINDOW); full=True rescans the whole history
+    (and is the only pass that sees an entry backdated before its vehicle's latest one).
+    """
+    start = time.time()
+    frame = stream_frame(df, stream)
+    tails = None if full else load_table(TAIL_TABLE)
+    tail = tails[tails["stream"] == stream] if tails is not None else None
+
+    if tail is not None and not tail.empty:
+        tail = tail.astype({"rowKey": str, "vehicleId": str})
+        # per vehicle: one vehicle's late sync must not hide behind another's newer entries
+        watermark = frame["vehicleId"].map(tail.groupby("vehicleId")["date"].max())
+        newer = watermark.isna() | (frame["date"] > watermark)
+        new = frame[newer & ~frame["rowKey"].isin(tail["rowKey"])]
+        combined = pd.concat([tail, new], ignore_index=True)
+    else:
+        new, combined = frame, frame
+
+    anomalies = score(combined)
+    anomalies = anomalies[anomalies["rowKey"].isin(new["rowKey"])]
+
+    other_tails = tails[tails["stream"] != stream] if tails is not None else None
+    save_table(TAIL_TABLE, pd.concat([other_tails, _tail(combined)], ignore_index=True))
+    if full:
+        previous = load_table(ANOMALY_TABLE)
+        kept = previous[previous["stream"] != stream] if previous is not None else None
+        save_table(ANOMALY_TABLE, pd.concat([kept, anomalies], ignore_index=True))
+    else:
+        append_table(ANOMALY_TABLE, anomalies)
+
+    print(f"\n🔎 {stream}: screened {len(new)} new entries, {len(anomalies)} anomalies ({time.time() - start:.2f}s)")
+    return anomalies
+
+
+def export_anomalies():
+    """Write every stored anomaly to Excel, newest first"""
+    anomalies = load_table(ANOMALY_TABLE)
+    if anomalies is None or anomalies.empty:
+        print("No anomalies stored yet.")
+        return
+    anomalies = anomalies.sort_values("date", ascending=False, ignore_index=True)
+    excel_ready(anomalies).to_excel(ONEDRIVE_PATH, index=False, engine="openpyxl")
+    print(f"✅ Saved {len(anomalies)} anomalies to: {ONEDRIVE_PATH}")
+
+
+# === Example usage: python fleet_anomalies.py [--full] (rescreens from the stored fuel / expense tables) ===
+if __name__ == "__main__":
+    full = "--full" in sys.argv
+    for stream, table in (("fuel", FUEL_TABLE), ("expense", EXPENSE_TABLE)):
+        rows = load_table(table)
+        if rows is not None:
+            screen(rows, stream, full=full)
+    export_anomalies()
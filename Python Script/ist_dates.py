@@ -0,0 +1,144 @@
+from datetime import datetime
+from lazy_imports import LazyModule
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
+
+# === IST timestamp handling shared by all extractors ===
+LOCAL_TZ = "Asia/Kolkata"
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"     # e.g. 2024-05-01T09:30:00.000 (+05:30 suffix)
+TIMESTAMP_LENGTH = 23                         # characters before the offset
+IST_OFFSET = "+05:30"
+FISCAL_YEAR_START_MONTH = 4                   # fiscal year starts in April
+DIMENSION_START = "2022-04-01"                # same start as the history extractors
+
+# Known timestamp columns across duties / invoices / receipts / notes / fuel / expenses
+TIMESTAMP_COLUMNS = [
+    "pickUpTime",
+    "dropOffTime",
+    "dutySlip.startDate",
+    "dutySlip.endDate",
+    "date",
+    "dueDate",
+    "invoiceDate",
+    "receiptDate",
+    "paymentDate",
+    "createdAt",
+    "updatedAt",
+    "validFrom",
+    "validTo",
+]
+TIMESTAMP_SUFFIXES = ("Time", "Date", "At")
+
+# === PATH TO SAVE DATE DIMENSION ===
+ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\date_dimension.xlsx"
+
+
+def parse_timestamp_series(series):
+    """Vectorized parse of '+05:30' ISO strings into tz-aware IST datetime64"""
+    text = series.astype("string")
+    # Fast path: the wall-clock part with a pinned format, localized as IST
+    # (per-row %z parsing is ~10x slower and every API timestamp carries +05:30)
+    is_ist = text.str.endswith(IST_OFFSET).fillna(False).astype(bool)
+    local = pd.to_datetime(text.str.slice(0, TIMESTAMP_LENGTH), format=TIMESTAMP_FORMAT, errors="coerce")
+    parsed = local.where(is_ist).dt.tz_localize(LOCAL_TZ)
+    # rows that miss the pinned format (no millis, 'Z' suffix, ...) get one generic retry
+    retry = parsed.isna() & text.notna()
+    if retry.any():
+        fallback = pd.to_datetime(text[retry].astype(object), format="ISO8601", errors="coerce", utc=True)
+        parsed[retry] = fallback.dt.tz_convert(LOCAL_TZ)
+    return parsed
+
+
+def parse_local_series(series):
+    """Vectorized parse of naive IST text (as the local store keeps timestamps) into tz-aware IST datetime64"""
+    try:
+        local = pd.to_datetime(series.astype("string").astype(object), format="ISO8601", errors="coerce")
+    except (TypeError, ValueError):   # naive and offset text mixed in one column
+        return pd.Series(pd.NaT, index=series.index, dtype=f"datetime64[ns, {LOCAL_TZ}]")
+    if isinstance(local.dtype, pd.DatetimeTZDtype):
+        return local.dt.tz_convert(LOCAL_TZ)
+    return local.dt.tz_localize(LOCAL_TZ)
+
+
+def unparsed_count(source, parsed):
+    """Non-blank values of `source` that came out of a parse as NaT (0 means the column converted cleanly)"""
+    text = source.astype("string").str.strip()
+    return int((text.notna() & (text != "")).sum()) - int(parsed.notna().sum())
+
+
+def find_timestamp_columns(df):
+    """Known timestamp columns plus any *Time / *Date / *At string column"""
+    cols = []
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.DatetimeTZDtype):
+            continue
+        if col in TIMESTAMP_COLUMNS or str(col).endswith(TIMESTAMP_SUFFIXES):
+            if df[col].dtype == object or pd.api.types.is_string_dtype(df[col]):
+                cols.append(col)
+    return cols
+
+
+def date_key(series):
+    """IST calendar day of a tz-aware datetime series as an int YYYYMMDD key"""
+    local = series.dt.tz_convert(LOCAL_TZ)
+    keys = local.dt.year * 10000 + local.dt.month * 100 + local.dt.day
+    return keys.astype("Int32")
+
+
+def parse_timestamps(df, columns=None, add_keys=True):
+    """Convert every timestamp column in one pass and add '<col>.dateKey' columns.
+
+    A column is only replaced when every non-blank value parsed; otherwise it is left as text.
+    """
+    columns = columns if columns is not None else find_timestamp_columns(df)
+    for col in columns:
+        if col not in df.columns:
+            continue
+        parsed = parse_timestamp_series(df[col])
+        failed = unparsed_count(df[col], parsed)
+        if failed:
+            print(f"  ⚠️ '{col}': {failed} values are not timestamps — column left as text")
+            continue
+        df[col] = parsed
+        if add_keys:
+            df[f"{col}.dateKey"] = date_key(df[col])
+    return df
+
+
+def build_date_dimension(start=DIMENSION_START, end=None):
+    """Generate one row per IST day with week, month and April-start fiscal attributes"""
+    end = end or datetime.today().strftime("%Y-%m-%d")
+    days = pd.date_range(start=start, end=end, freq="D")
+
+    fiscal_start_year = days.year - (days.month < FISCAL_YEAR_START_MONTH)
+    fiscal_month = (days.month - FISCAL_YEAR_START_MONTH) % 12 + 1
+    iso = days.isocalendar()
+
+    dim = pd.DataFrame({
+        "dateKey": (days.year * 10000 + days.month * 100 + days.day).astype("int32"),
+        "date": days,
+        "year": days.year.astype("int16"),
+        "month": days.month.astype("int8"),
+        "monthName": days.strftime("%b"),
+        "monthKey": (days.year * 100 + days.month).astype("int32"),
+        "day": days.day.astype("int8"),
+        "dayOfWeek": (days.dayofweek + 1).astype("int8"),   # Monday = 1
+        "dayName": days.strftime("%a"),
+        "isWeekend": days.dayofweek >= 5,
+        "isoYear": iso["year"].to_numpy().astype("int16"),
+        "isoWeek": iso["week"].to_numpy().astype("int8"),
+        "weekStart": days - pd.to_timedelta(days.dayofweek, unit="D"),
+        "fiscalYear": [f"FY{y}-{(y + 1) % 100:02d}" for y in fiscal_start_year],
+        "fiscalYearStart": fiscal_start_year.astype("int16"),
+        "fiscalMonth": fiscal_month.astype("int8"),
+        "fiscalQuarter": ((fiscal_month - 1) // 3 + 1).astype("int8"),
+    })
+    return dim
+
+
+# === Example usage: write the shared date dimension for Power BI ===
+if __name__ == "__main__":
+    dim = build_date_dimension()
+    dim.to_excel(ONEDRIVE_PATH, sheet_name="Dates", index=False, engine="openpyxl")
+    print(f"✅ Saved {len(dim)} days ({dim['date'].min().date()} → {dim['date'].max().date()}) to: {ONEDRIVE_PATH}")
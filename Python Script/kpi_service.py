@@ -0,0 +1,271 @@
+import os
+import sys
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import fast_json
+from local_store import STORE_PATH
+
+# === Local KPI service: pre-aggregated KPIs + filtered queries over the local store ===
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_ENTRIES = 256
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 10000
+
+AMOUNT_CANDIDATES = ["amount", "totalAmount", "grandTotal", "total"]
+OUTSTANDING_CANDIDATES = ["balance", "balanceAmount", "amountDue", "dueAmount", "outstanding"]
+INVOICE_DAY_CANDIDATES = ["date.dateKey", "invoiceDate.dateKey", "createdAt.dateKey"]
+INVOICE_ID_CANDIDATES = ["id", "invoiceId", "_id", "invoiceNumber"]
+REVENUE_TABLES = ["billed_invoices", "completed_invoices"]   # an invoice can sit in both (and on several duty rows)
+BOARD_TABLES = ["dispatched_live", "dispatched"]     # live feed first, else the last snapshot
+
+# /duties and /invoices: allowed tables and the columns that can be filtered by equality
+DUTY_TABLES = ["dispatched", "dispatched_live", "billed_duties", "completed_duties"]
+INVOICE_TABLES = ["billed_invoices", "completed_invoices", "paid_invoices", "unpaid_invoices"]
+FILTER_COLUMNS = ["dutyId", "vehicleId", "driverId", "status", "customer", "Customer Name",
+                  "invoiceNumber", "invoiceId", "id"]
+
+
+def _first_present(columns, candidates):
+    for col in candidates:
+        if col in columns:
+            return col
+    return None
+
+
+class ResultCache:
+    """LRU of encoded responses, emptied whenever the store file changes (i.e. a sync wrote to it)"""
+
+    def __init__(self, path=STORE_PATH, max_entries=CACHE_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.version = None
+        self.hits = self.misses = 0
+
+    def _store_version(self):
+        stamps = []
+        for suffix in ("", "-wal"):
+            try:
+                stamps.append(os.stat(self.path + suffix).st_mtime_ns)
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def get(self, key):
+        with self.lock:
+            version = self._store_version()
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        with self.lock:
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+class KpiStore:
+    """One shared read connection to the store (SQLite serializes access; the cache absorbs repeats)"""
+
+    def __init__(self, path=STORE_PATH):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()   # opens the WAL before the cache takes its first version
+        self.lock = threading.Lock()
+
+    def rows(self, sql, params=()):
+        with self.lock:
+            cursor = self.conn.execute(sql, params)
+            names = [d[0] for d in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def columns(self, table):
+        with self.lock:
+            return [row[1] for row in self.conn.execute(f'PRAGMA table_info("{table}")')]
+
+    def first_table(self, candidates):
+        for table in candidates:
+            if self.columns(table):
+                return table
+        return None
+
+
+def _today_key(now):
+    return now.year * 10000 + now.month * 100 + now.day
+
+
+def revenue(store, now):
+    """Invoice amount for today and month to date, each invoice counted once across billed + completed"""
+    today = _today_key(now)
+    month_start = today // 100 * 100 + 1
+    selects, params = [], []
+    for table in REVENUE_TABLES:
+        columns = store.columns(table)
+        amount, day = _first_present(columns, AMOUNT_CANDIDATES), _first_present(columns, INVOICE_DAY_CANDIDATES)
+        invoice = _first_present(columns, INVOICE_ID_CANDIDATES)
+        if not amount or not day or not invoice:
+            continue
+        selects.append(
+            f'SELECT "{invoice}" AS invoice, "{amount}" AS amount, "{day}" AS day '
+            f'FROM "{table}" WHERE "{day}" BETWEEN ? AND ?'
+        )
+        params += [month_start, today]
+    if not selects:
+        return {"today": 0.0, "monthToDate": 0.0, "invoicesToday": 0}
+    row = store.rows(
+        "SELECT TOTAL(CASE WHEN day = ? THEN amount END) AS today, SUM(day = ?) AS invoices, TOTAL(amount) AS mtd "
+        f"FROM (SELECT invoice, MAX(amount) AS amount, MAX(day) AS day FROM ({' UNION ALL '.join(selects)}) GROUP BY invoice)",
+        (today, today, *params),
+    )[0]
+    return {"today": row["today"], "monthToDate": row["mtd"], "invoicesToday": row["invoices"] or 0}
+
+
+def on_duty(store, now):
+    """Vehicles whose duty window covers now, plus today's duty count (live board if running)"""
+    table = store.first_table(BOARD_TABLES)
+    if table is None:
+        return {"source": None, "vehiclesOnDuty": 0, "dutiesToday": 0}
+    stamp = now.strftime("%Y-%m-%d %H:%M:%S")   # stored timestamps are naive IST text
+    vehicles = store.rows(
+        f'SELECT DISTINCT "vehicleId" FROM "{table}" '
+        f'WHERE "pickUpTime" <= ? AND ("dropOffTime" IS NULL OR "dropOffTime" > ?) AND "vehicleId" IS NOT NULL',
+        (stamp, stamp),
+    )
+    today = store.rows(f'SELECT COUNT(*) AS n FROM "{table}" WHERE "pickUpTime.dateKey" = ?', (_today_key(now),))
+    return {"source": table, "vehiclesOnDuty": len(vehicles),
+            "vehicleIds": [v["vehicleId"] for v in vehicles], "dutiesToday": today[0]["n"]}
+
+
+def receivables(store):
+    columns = store.columns("unpaid_invoices")
+    amount = _first_present(columns, OUTSTANDING_CANDIDATES + AMOUNT_CANDIDATES)
+    if not amount:
+        return {"outstanding": 0.0, "openInvoices": 0}
+    row = store.rows(f'SELECT TOTAL("{amount}") AS total, COUNT(*) AS n FROM unpaid_invoices')[0]
+    return {"outstanding": row["total"], "openInvoices": row["n"]}
+
+
+def filtered_rows(store, table, params, day_columns):
+    """Equality filters on FILTER_COLUMNS plus from/to (YYYY-MM-DD) on the table's day key"""
+    columns = store.columns(table)
+    if not columns:
+        raise LookupError(f"Table '{table}' is not in the store")
+    where, values = [], []
+    for col in FILTER_COLUMNS:
+        if col in params and col in columns:
+            where.append(f'"{col}" = ?')
+            values.append(params[col])
+    day = _first_present(columns, day_columns)
+    for name, op in (("from", ">="), ("to", "<=")):
+        if name in params and day:
+            where.append(f'"{day}" {op} ?')
+            values.append(int(params[name].replace("-", "")))
+    limit = min(int(params.get("limit", DEFAULT_LIMIT)), MAX_LIMIT)
+    sql = f'SELECT * FROM "{table}"' + (f" WHERE {' AND '.join(where)}" if where else "")
+    sql += f' ORDER BY "{day}" DESC' if day else ""
+    return store.rows(sql + " LIMIT ?", (*values, limit))
+
+
+class KpiHandler(BaseHTTPRequestHandler):
+    store = None
+    cache = None
+
+    def _send(self, status, body, cache_state="-"):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Cache", cache_state)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _answer(self, path, params):
+        now = datetime.now()
+        if path == "/kpi/revenue":
+            return revenue(self.store, now)
+        if path == "/kpi/on-duty":
+            return on_duty(self.store, now)
+        if path == "/kpi/receivables":
+            return receivables(self.store)
+        if path == "/kpi":
+            return {"asOf": now.isoformat(timespec="seconds"), "revenue": revenue(self.store, now),
+                    "onDuty": on_duty(self.store, now), "receivables": receivables(self.store)}
+        if path == "/duties":
+            table = params.get("table", "dispatched")
+            if table not in DUTY_TABLES:
+                raise LookupError(f"table must be one of {DUTY_TABLES}")
+            return filtered_rows(self.store, table, params, ["pickUpTime.dateKey"])
+        if path == "/invoices":
+            table = params.get("table", "billed_invoices")
+            if table not in INVOICE_TABLES:
+                raise LookupError(f"table must be one of {INVOICE_TABLES}")
+            return filtered_rows(self.store, table, params, INVOICE_DAY_CANDIDATES)
+        return None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            return self._send(200, fast_json.dumps({"ok": True, "cache": self.cache.stats()}))
+        params = dict(parse_qsl(url.query))
+        # time-based KPIs roll over each minute even when no sync ran
+        key = (url.path, tuple(sorted(params.items())), datetime.now().strftime("%Y%m%d%H%M"))
+        body = self.cache.get(key)
+        if body is not None:
+            return self._send(200, body, "hit")
+        try:
+            result = self._answer(url.path, params)
+        except (LookupError, ValueError) as e:
+            return self._send(400, fast_json.dumps({"error": str(e)}))
+        if result is None:
+            return self._send(404, fast_json.dumps({"error": f"Unknown path {url.path}"}))
+        body = fast_json.dumps(result)
+        self.cache.put(key, body)
+        self._send(200, body, "miss")
+
+    def do_POST(self):
+        if urlsplit(self.path).path == "/invalidate":
+            self.cache.clear()
+            return self._send(200, fast_json.dumps({"ok": True}))
+        self._send(404, fast_json.dumps({"error": "Unknown path"}))
+
+    def log_message(self, format, *args):
+        pass   # one line per request would drown the console
+
+
+def serve(host=HOST, port=PORT, path=STORE_PATH):
+    KpiHandler.store = KpiStore(path)
+    KpiHandler.cache = ResultCache(path)
+    server = ThreadingHTTPServer((host, port), KpiHandler)
+    print(f"📊 KPI service on http://{host}:{port} (/kpi, /kpi/revenue, /kpi/on-duty, /kpi/receivables, /duties, /invoices)")
+    return server
+
+
+# === Example usage: python kpi_service.py [port] then open http://127.0.0.1:8765/kpi ===
+if __name__ == "__main__":
+    server = serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else PORT)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ KPI service stopped.")
+        server.server_close()
@@ -0,0 +1,28 @@
+import importlib
+
+
+class LazyModule:
+    """Stand-in for a heavy module that is only imported on first attribute access.
+
+    Usage:  pd = LazyModule("pandas")   # nothing imported yet
+            pd.DataFrame(...)           # pandas imported here, once
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule '{self._name}' ({state})>"
@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import sqlite3
+import time
+from lazy_imports import LazyModule
+
+from compact_types import excel_ready
+from ist_dates import find_timestamp_columns, parse_local_series, unparsed_count
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
+
+# === LOCAL ANALYTICAL STORE (SQLite, kept outside OneDrive to avoid sync locks) ===
+STORE_PATH = r"C:\Users\lenovo\API Call Data\car_rental.sqlite"
+
+# Every table gets an index on whichever of these columns it has
+INDEX_COLUMNS = [
+    "dutyId",
+    "id",
+    "_id",
+    "invoiceId",
+    "invoiceNumber",
+    "vehicleId",
+    "driverId",
+    "pickUpTime.dateKey",
+    "date.dateKey",
+    "date",
+    "entityKey",
+]
+
+# Ready-made cross-entity questions (column names follow the extractor outputs)
+QUERIES = {
+    "billed_without_receipt": """
+        SELECT i.*
+        FROM billed_invoices i
+        LEFT JOIN receipts r ON r."invoiceId" = i."id"
+        WHERE r."invoiceId" IS NULL
+    """,
+    "fuel_spend_per_vehicle": """
+        SELECT "vehicleId", COUNT(*) AS fills, SUM("amount") AS fuel_spend
+        FROM vehicle_fuels
+        GROUP BY "vehicleId"
+        ORDER BY fuel_spend DESC
+    """,
+}
+
+
+def connect(path=STORE_PATH):
+    """Open the store with settings tuned for bulk loads and fast reads"""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def _sqlite_ready(df):
+    """Strip timezones, unwrap categoricals and JSON-encode nested values"""
+    out = excel_ready(df)
+    for col in out.columns:
+        series = out[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            out[col] = series.astype(object)
+        elif series.dtype == object:
+            nested = series.map(lambda v: isinstance(v, (list, dict)))
+            if nested.any():
+                out[col] = series.where(~nested, series[nested].map(json.dumps))
+    return out
+
+
+def _create_indexes(conn, table, columns):
+    for col in INDEX_COLUMNS:
+        if col in columns:
+            index_name = f"ix_{table}_{col}".replace(".", "_")
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table}" ("{col}")')
+
+
+def save_table(table, df, path=STORE_PATH):
+    """Replace `table` with the contents of df and (re)build its indexes"""
+    if df is None or len(df.columns) == 0:
+        print(f"  🗄️ Nothing to store for table '{table}'.")
+        return 0
+    start = time.time()
+    conn = connect(path)
+    try:
+        with conn:
+            _sqlite_ready(df).to_sql(table, conn, if_exists="replace", index=False, chunksize=10000)
+            _create_indexes(conn, table, df.columns)
+    finally:
+        conn.close()
+    print(f"  🗄️ Stored {len(df)} rows in table '{table}' ({time.time() - start:.1f}s)")
+    return len(df)
+
+
+def append_table(table, df, path=STORE_PATH):
+    """Append rows to `table` (created with its indexes on first use, new columns added as they appear)"""
+    if df is None or df.empty:
+        return 0
+    conn = connect(path)
+    try:
+        with conn:
+            existing = table_columns(table, conn)
+            for col in df.columns:
+                if existing and col not in existing:
+                    conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}"')
+            _sqlite_ready(df).to_sql(table, conn, if_exists="append", index=False, chunksize=10000)
+            _create_indexes(conn, table, df.columns)
+    finally:
+        conn.close()
+    print(f"  🗄️ Appended {len(df)} rows to table '{table}'")
+    return len(df)
+
+
+def query(sql, params=(), path=STORE_PATH):
+    """Run SQL (or the name of a ready-made query) and return a DataFrame"""
+    sql = QUERIES.get(sql, sql)
+    conn = connect(path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def table_columns(table, conn=None, path=STORE_PATH):
+    """Column names of a stored table (empty list if it does not exist)"""
+    if conn is None:
+        conn = connect(path)
+        try:
+            return table_columns(table, conn)
+        finally:
+            conn.close()
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def load_table(table, columns=None, path=STORE_PATH):
+    """Read a stored table back with timestamp columns as IST datetimes (None if it does not exist)"""
+    conn = connect(path)
+    try:
+        present = table_columns(table, conn)
+        if not present:
+            return None
+        selected = [c for c in columns if c in present] if columns else present
+        column_sql = ", ".join(f'"{c}"' for c in selected)
+        df = pd.read_sql_query(f'SELECT {column_sql} FROM "{table}"', conn)
+    finally:
+        conn.close()
+    # timestamps were stored as naive IST text; all-or-nothing like parse_timestamps
+    for col in find_timestamp_columns(df):
+        parsed = parse_local_series(df[col])
+        failed = unparsed_count(df[col], parsed)
+        if failed:
+            print(f"  ⚠️ {table}.{col}: {failed} values are not timestamps — column left as text")
+            continue
+        df[col] = parsed
+    return df
+
+
+def tables(path=STORE_PATH):
+    """List stored tables with their row counts"""
+    conn = connect(path)
+    try:
+        names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+        return {name: conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] for name in names}
+    finally:
+        conn.close()
+
+
+# === Example usage: python local_store.py "SELECT ..." | <query name> ===
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        for name, rows in tables().items():
+            print(f"{name}: {rows} rows")
+        print(f"\nReady-made queries: {', '.join(QUERIES)}")
+        raise SystemExit()
+
+    start = time.time()
+    result = query(sys.argv[1])
+    print(result.to_string(index=False))
+    print(f"\n{len(result)} rows in {(time.time() - start) * 1000:.0f} ms")
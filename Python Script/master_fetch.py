@@ -0,0 +1,167 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+from lazy_imports import LazyModule
+
+import fast_json
+from auth_refresh import get_auth_headers
+from local_store import STORE_PATH
+from page_archive import archive_page
+
+# heavy dependencies load on first use
+requests = LazyModule("requests")
+
+# === Conditional fetching for the master endpoints (/vehicles, /drivers, /suppliers) ===
+# page bodies + per-master state live next to the local store, outside OneDrive
+CACHE_DIR = os.path.join(os.path.dirname(STORE_PATH), "master_pages")
+PAGE_LIMIT = 1000
+PROBE_LIMIT = 1              # one-record requests used to detect change cheaply
+# master records carry no updatedAt to probe on, and an edit in the middle moves neither probe record,
+# so each daily run also revalidates every page (If-None-Match: a 304 per quiet page, no body);
+# a sweep in which no page changed is treated exactly like a matching probe (no export, no history)
+FULL_SWEEP_HOURS = 20
+MAX_RETRIES = 3
+SLEEP_BETWEEN_PAGES = 0.2
+
+
+def _state_path(master):
+    return os.path.join(CACHE_DIR, f"{master}.state.json")
+
+
+def _page_path(master, page):
+    return os.path.join(CACHE_DIR, f"{master}.page{page:04d}.json.gz")
+
+
+def _read_state(master):
+    try:
+        with open(_state_path(master), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_state(master, state):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(_state_path(master), "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+
+
+def _get(url, headers, params, etag=None):
+    """GET with timeout retries, one token refresh on 401 and an optional If-None-Match"""
+    request_headers = dict(headers, **({"If-None-Match": etag} if etag else {}))
+    for attempt in range(MAX_RETRIES):
+        try:
+            response = requests.get(url, headers=request_headers, params=params, timeout=60)
+        except requests.exceptions.Timeout:
+            print(f"  Timeout attempt {attempt + 1}/{MAX_RETRIES} — retrying...")
+            time.sleep(5)
+            continue
+        if response.status_code == 401:
+            print("  ⚠️ Token expired, refreshing...")
+            headers = get_auth_headers(force=True)
+            request_headers = dict(headers, **({"If-None-Match": etag} if etag else {}))
+            continue
+        return response
+    return None
+
+
+def probe_signature(url, headers):
+    """meta.total plus hashes of the first and last record: one or two one-record requests"""
+    first = _get(url, headers, {"page": 1, "limit": PROBE_LIMIT})
+    if first is None or first.status_code != 200:
+        return None
+    total = (fast_json.decode_response(first).get("meta") or {}).get("total")
+    parts = [str(total), hashlib.sha1(first.content).hexdigest()]
+    if total and int(total) > 1:
+        last = _get(url, headers, {"page": int(total), "limit": PROBE_LIMIT})
+        if last is None or last.status_code != 200:
+            return None
+        parts.append(hashlib.sha1(last.content).hexdigest())
+    return "|".join(parts)
+
+
+def _fetch_pages(master, url, headers, state):
+    """Every page, revalidated with its stored ETag; 304 pages come from the local cache"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    pages = state.get("pages", {})
+    all_data, total_expected, changed_pages, page = [], None, 0, 1
+    while True:
+        cached = pages.get(str(page), {})
+        print(f"Requesting page {page} (limit={PAGE_LIMIT})...")
+        params = {"page": page, "limit": PAGE_LIMIT}
+        response = _get(url, headers, params, etag=cached.get("etag"))
+        if response is not None and response.status_code == 304 and not os.path.exists(_page_path(master, page)):
+            response = _get(url, headers, params)   # cache file lost: fetch the body unconditionally
+        if response is None:
+            print("  Failed to get response after retries.")
+            return None, None, 0
+
+        if response.status_code == 304:
+            with gzip.open(_page_path(master, page), "rb") as f:
+                body = f.read()
+            print("  304 Not Modified — using cached page")
+        elif response.status_code == 200:
+            body = response.content
+            digest = hashlib.sha1(body).hexdigest()
+            if digest != cached.get("sha1"):
+                changed_pages += 1
+                with gzip.open(_page_path(master, page), "wb") as f:
+                    f.write(body)
+            pages[str(page)] = {"etag": response.headers.get("ETag"), "sha1": digest}
+        else:
+            print(f"  Error {response.status_code}: {response.text[:500]}")
+            return None, None, 0
+
+        try:
+            result = fast_json.loads(body)
+        except ValueError:
+            print("  Non-JSON response, stopping.")
+            return None, None, 0
+        data_page = result.get("data") or []
+        if total_expected is None:
+            total_expected = (result.get("meta") or {}).get("total")
+        all_data.extend(data_page)
+        if response.status_code == 200:
+            archive_page(master, data_page)   # unchanged (304) pages are archived already
+        print(f"  Received {len(data_page)} records on page {page} — collected so far: {len(all_data)} (meta.total={total_expected})")
+
+        if (total_expected and len(all_data) >= int(total_expected)) or len(data_page) < PAGE_LIMIT:
+            break
+        page += 1
+        time.sleep(SLEEP_BETWEEN_PAGES)
+
+    # drop pages beyond the new end (the master shrank)
+    state["pages"] = {k: v for k, v in pages.items() if int(k) <= page}
+    return all_data, total_expected, changed_pages
+
+
+def fetch_master(master, url, headers, force=False):
+    """(records, meta.total) for a master, or (None, total) when nothing changed since the last run.
+
+    A cheap probe (meta.total + first/last record hashes) short-circuits repeat runs;
+    otherwise pages are revalidated with ETags and only changed bodies are re-cached.
+    The revalidation is forced every FULL_SWEEP_HOURS, so edits to middle records are seen
+    the same day (their SCD2 validFrom stays the day of the edit). Quiet days cost the probe
+    plus one 304 per page; servers without ETags send every page body, which is then hashed.
+    """
+    state = _read_state(master)
+    signature = probe_signature(url, headers)
+    sweep_due = time.time() - state.get("last_sweep", 0) > FULL_SWEEP_HOURS * 3600
+    if not force and not sweep_due and signature is not None and signature == state.get("signature"):
+        print(f"✅ {master}: unchanged since {time.strftime('%Y-%m-%d %H:%M', time.localtime(state['last_sweep']))} "
+              f"(probe {signature.split('|')[0]} records) — skipping fetch")
+        return None, state.get("total")
+
+    all_data, total_expected, changed_pages = _fetch_pages(master, url, headers, state)
+    if all_data is None:
+        return [], total_expected
+    print(f"  {changed_pages} of {len(state['pages'])} pages changed since the last run")
+    unchanged = not force and changed_pages == 0 and total_expected == state.get("total") and "last_sweep" in state
+    state.update(signature=signature, total=total_expected, last_sweep=time.time())
+    _write_state(master, state)
+    if unchanged:
+        print(f"✅ {master}: every page matched the last sweep — skipping export")
+        return None, total_expected
+    return all_data, total_expected
@@ -0,0 +1,177 @@
+import sys
+import json
+import time
+from lazy_imports import LazyModule
+
+from ist_dates import LOCAL_TZ
+from local_store import append_table, connect, load_table, table_columns
+
+# heavy dependencies load on first use
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# === SCD type-2 history for master data (one *_history table per master) ===
+# business key candidates per master, first one present wins
+MASTER_KEYS = {
+    "vehicles": ["_id", "id", "vehicleId", "number"],
+    "drivers": ["_id", "id", "phone"],
+    "suppliers": ["_id", "id", "name"],
+}
+SCD_COLUMNS = ["entityKey", "rowHash", "validFrom", "validTo", "isCurrent"]
+
+
+def history_table(master):
+    return f"{master}_history"
+
+
+def _key_column(df, master):
+    for col in MASTER_KEYS[master]:
+        if col in df.columns:
+            return col
+    raise KeyError(f"No business key for {master} (tried {MASTER_KEYS[master]})")
+
+
+def row_hashes(df):
+    """Stable 64-bit hash per row over the attribute columns.
+
+    Each non-null cell is hashed together with its column name and the cell hashes
+    are summed, so column order does not matter and a new all-null API field does
+    not turn every record into a "change".
+    """
+    total = np.zeros(len(df), dtype="uint64")
+    for col in df.columns:
+        values = df[col]
+        present = values.notna().to_numpy()
+        if not present.any():
+            continue
+        if values.dtype == object:
+            values = values.map(lambda v: json.dumps(v, sort_keys=True) if isinstance(v, (list, dict)) else v)
+        cells = pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+        salt = pd.util.hash_array(np.array([str(col)], dtype=object))[0]
+        named = pd.util.hash_array(cells ^ salt)
+        total += np.where(present, named, np.uint64(0))
+    return pd.Series(total, index=df.index).map("{:016x}".format)
+
+
+def _current_hashes(conn, table):
+    if "isCurrent" not in table_columns(table, conn):
+        return pd.Series(dtype=object)
+    current = pd.read_sql_query(f'SELECT "entityKey", "rowHash" FROM "{table}" WHERE "isCurrent" = 1', conn)
+    return current.set_index("entityKey")["rowHash"]
+
+
+def record_versions(master, df, seen_at=None):
+    """Write only new / changed / vanished records of a full master download as SCD2 versions.
+
+    Changed and vanished keys get their open version closed (validTo = seen_at);
+    new and changed keys get a new open version. Returns (new, changed, closed) counts.
+    """
+    start = time.time()
+    seen_at = pd.Timestamp(seen_at) if seen_at is not None else pd.Timestamp.now(tz=LOCAL_TZ)
+    seen_at = seen_at.tz_localize(LOCAL_TZ) if seen_at.tzinfo is None else seen_at.tz_convert(LOCAL_TZ)
+    table = history_table(master)
+    key_col = _key_column(df, master)
+
+    incoming = df.dropna(subset=[key_col]).drop_duplicates(key_col, keep="last").reset_index(drop=True)
+    keys = incoming[key_col].astype(str)
+    hashes = row_hashes(incoming)
+
+    conn = connect()
+    try:
+        current = _current_hashes(conn, table)
+        previous = keys.map(current)
+        is_new = previous.isna()
+        is_changed = previous.notna() & (previous != hashes)
+        vanished = current.index.difference(keys)
+        to_close = list(keys[is_changed]) + list(vanished)
+
+        if to_close:
+            closed_at = seen_at.tz_localize(None).isoformat(sep=" ")   # naive IST text, like every stored timestamp
+            with conn:
+                conn.executemany(
+                    f'UPDATE "{table}" SET "validTo" = ?, "isCurrent" = 0 WHERE "entityKey" = ? AND "isCurrent" = 1',
+                    [(closed_at, key) for key in to_close],
+                )
+    finally:
+        conn.close()
+
+    versions = incoming[is_new | is_changed].copy()
+    versions.insert(0, "entityKey", keys[is_new | is_changed])
+    versions["rowHash"] = hashes[is_new | is_changed]
+    versions["validFrom"] = seen_at
+    versions["validTo"] = pd.Series(pd.NaT, index=versions.index, dtype=f"datetime64[ns, {LOCAL_TZ}]")
+    versions["isCurrent"] = 1
+    append_table(table, versions)
+    _refresh_current_view(master)
+
+    print(f"  🕰️ {master}: {int(is_new.sum())} new, {int(is_changed.sum())} changed, "
+          f"{len(vanished)} vanished, {int((~is_new & ~is_changed).sum())} unchanged ({time.time() - start:.2f}s)")
+    return int(is_new.sum()), int(is_changed.sum()), len(vanished)
+
+
+def _refresh_current_view(master):
+    """Keep `master` queryable as the current versions (replaces the old full-snapshot table)"""
+    conn = connect()
+    try:
+        with conn:
+            kind = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (master,)).fetchone()
+            if kind and kind[0] == "table":
+                conn.execute(f'DROP TABLE "{master}"')
+            conn.execute(
+                f'CREATE VIEW IF NOT EXISTS "{master}" AS '
+                f'SELECT * FROM "{history_table(master)}" WHERE "isCurrent" = 1'
+            )
+    finally:
+        conn.close()
+
+
+def versions_as_of(master, when):
+    """Every record of a master as it was at `when` (IST timestamp or string)"""
+    history = load_table(history_table(master))
+    if history is None:
+        return None
+    when = pd.Timestamp(when)
+    when = when.tz_localize(LOCAL_TZ) if when.tzinfo is None else when
+    valid = (history["validFrom"] <= when) & (history["validTo"].isna() | (history["validTo"] > when))
+    return history[valid].reset_index(drop=True)
+
+
+def point_in_time_join(df, master, key_col, time_col, columns=None, backfill=True):
+    """Attach the master version valid at each row's `time_col` (e.g. duties.vehicleId @ pickUpTime).
+
+    With backfill, rows older than a key's first recorded version use that first version,
+    since history only starts when this store first saw the record.
+    """
+    history = load_table(history_table(master))
+    if history is None:
+        return df
+    attrs = [c for c in (columns or history.columns) if c not in SCD_COLUMNS]
+    versions = history[["entityKey", "validFrom", "validTo"] + attrs].sort_values("validFrom")
+    versions = versions.rename(columns={c: f"{master}.{c}" for c in attrs})
+
+    left = df.assign(_key=df[key_col].astype(str), _row=range(len(df)))
+    timed = left.dropna(subset=[time_col]).sort_values(time_col)
+    joined = pd.merge_asof(timed, versions, left_on=time_col, right_on="validFrom",
+                           left_by="_key", right_by="entityKey", direction="backward")
+    expired = joined["validTo"].notna() & (joined[time_col] >= joined["validTo"])
+    joined.loc[expired, list(versions.columns)] = None
+
+    if backfill:
+        first = versions.drop_duplicates("entityKey", keep="first").set_index("entityKey")
+        before = joined["entityKey"].isna() & (joined[time_col] < joined["_key"].map(first["validFrom"]))
+        for col in first.columns:
+            joined.loc[before, col] = joined.loc[before, "_key"].map(first[col])
+
+    joined = joined.drop(columns=["entityKey", "validFrom", "validTo"])
+    out = left.merge(joined[["_row"] + [c for c in joined.columns if c.startswith(f"{master}.")]], on="_row", how="left")
+    return out.drop(columns=["_key", "_row"])
+
+
+# === Example usage: python master_history.py <master> [YYYY-MM-DD] ===
+if __name__ == "__main__":
+    master = sys.argv[1] if len(sys.argv) > 1 else "drivers"
+    when = sys.argv[2] if len(sys.argv) > 2 else pd.Timestamp.now(tz=LOCAL_TZ)
+    snapshot = versions_as_of(master, when)
+    print(f"{master} as of {when}: {0 if snapshot is None else len(snapshot)} records")
+    if snapshot is not None:
+        print(snapshot.head(20).to_string())
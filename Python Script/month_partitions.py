@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import time
+import hashlib
+from datetime import datetime
+from importlib.util import find_spec
+from lazy_imports import LazyModule
+
+from arrow_outputs import arrow_column
+from compact_types import excel_ready
+from ist_dates import LOCAL_TZ
+
+# heavy dependencies load on first use
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# optional, loaded on the first parquet write
+if find_spec("pyarrow") is not None:
+    pa = LazyModule("pyarrow")
+    pq = LazyModule("pyarrow.parquet")
+else:
+    pa = pq = None
+
+# === Month-partitioned copies of the fact tables for Power BI incremental refresh ===
+# one folder per entity: <entity>_YYYY-MM.parquet files plus _manifest.json
+PARTITION_ROOT = r"C:\Users\lenovo\OneDrive\API Call\partitions"
+FORMAT = "parquet" if pq is not None else "csv"
+MONTH_CANDIDATES = ["pickUpTime", "invoiceDate", "receiptDate", "paymentDate", "date", "createdAt"]
+UNDATED = "undated"
+
+
+def _first_present(df, candidates):
+    for col in candidates:
+        if col in df.columns:
+            return col
+    return None
+
+
+def entity_dir(entity):
+    return os.path.join(PARTITION_ROOT, entity)
+
+
+def manifest_path(entity):
+    return os.path.join(entity_dir(entity), "_manifest.json")
+
+
+def read_manifest(entity):
+    try:
+        with open(manifest_path(entity), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"entity": entity, "partitions": {}}
+
+
+def month_keys(df, date_col):
+    """'YYYY-MM' (IST) per row; rows without a date land in the 'undated' partition"""
+    dates = df[date_col]
+    if not isinstance(dates.dtype, pd.DatetimeTZDtype):
+        dates = pd.to_datetime(dates, errors="coerce", utc=True)
+    local = dates.dt.tz_convert(LOCAL_TZ)
+    keys = local.dt.year * 100 + local.dt.month   # strftime per row is ~20x slower
+    labels = {k: f"{int(k) // 100:04d}-{int(k) % 100:02d}" for k in keys.dropna().unique()}
+    return keys.map(labels).fillna(UNDATED)
+
+
+def row_hashes(df):
+    """64-bit hash per row (nested list/dict cells hashed as sorted-key JSON)"""
+    hashable = df.copy()
+    for col in hashable.columns:
+        if hashable[col].dtype == object:
+            hashable[col] = hashable[col].map(
+                lambda v: json.dumps(v, sort_keys=True, default=str) if isinstance(v, (list, dict)) else v
+            ).astype(str)
+    return pd.util.hash_pandas_object(hashable, index=False).to_numpy()
+
+
+def partition_digest(columns, hashes):
+    """Content hash of a partition that ignores row order (API pages come back in any order)"""
+    header = "|".join(map(str, columns)).encode("utf-8")
+    return hashlib.sha1(header + np.sort(hashes).tobytes()).hexdigest()
+
+
+def _write_file(df, path):
+    tmp_path = path + ".tmp"
+    if FORMAT == "parquet":
+        df = df.reset_index(drop=True)
+        table = pa.table({str(col): arrow_column(df[col]) for col in df.columns})
+        pq.write_table(table, tmp_path, compression="snappy")
+    else:
+        excel_ready(df).to_csv(tmp_path, index=False, encoding="utf-8")
+    os.replace(tmp_path, path)   # a refresh never reads a half-written partition
+
+
+def write_partitions(entity, df, date_col=None, complete=True):
+    """Write one file per month of df, rewriting only months whose content changed.
+
+    complete=True means df is the entity's whole history, so months that no longer
+    have rows are deleted; pass False for windowed pulls (only their months are touched).
+    Returns the list of rewritten months.
+    """
+    start = time.time()
+    date_col = date_col or _first_present(df, MONTH_CANDIDATES)
+    if date_col is None:
+        print(f"  ⚠️ {entity}: no date column {MONTH_CANDIDATES} — partitions not written")
+        return []
+    folder = entity_dir(entity)
+    os.makedirs(folder, exist_ok=True)
+    manifest = read_manifest(entity)
+    previous = manifest.get("partitions", {})
+    if manifest.get("format") != FORMAT or manifest.get("dateColumn") != date_col:
+        previous = {}   # layout changed: rewrite everything
+
+    hashes = row_hashes(df)
+    partitions, changed = {}, []
+    for month, positions in df.groupby(month_keys(df, date_col).to_numpy(), sort=True).indices.items():
+        part = df.iloc[positions]
+        digest = partition_digest(df.columns, hashes[positions])
+        file = f"{entity}_{month}.{FORMAT}"
+        entry = previous.get(month)
+        if entry and entry["digest"] == digest and os.path.exists(os.path.join(folder, file)):
+            partitions[month] = entry
+            continue
+        _write_file(part, os.path.join(folder, file))
+        partitions[month] = {
+            "file": file,
+            "rows": int(len(part)),
+            "digest": digest,
+            "updatedAt": datetime.now().isoformat(timespec="seconds"),
+        }
+        changed.append(month)
+
+    for month, entry in previous.items():
+        if month in partitions:
+            continue
+        if complete:
+            path = os.path.join(folder, entry["file"])
+            if os.path.exists(path):
+                os.remove(path)
+            changed.append(month)
+        else:
+            partitions[month] = entry
+
+    manifest = {
+        "entity": entity,
+        "dateColumn": date_col,
+        "format": FORMAT,
+        "rows": sum(p["rows"] for p in partitions.values()),
+        "generatedAt": datetime.now().isoformat(timespec="seconds"),
+        "partitions": dict(sorted(partitions.items())),
+    }
+    tmp_path = manifest_path(entity) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path(entity))
+
+    print(f"  🗂️ {entity}: {len(changed)} of {len(partitions)} month partitions rewritten ({time.time() - start:.1f}s)")
+    return changed
+
+
+# === Example usage: python month_partitions.py <entity> (rebuilds partitions from the local store) ===
+if __name__ == "__main__":
+    from local_store import load_table
+
+    entity = sys.argv[1] if len(sys.argv) > 1 else "billed_duties"
+    rows = load_table(entity)
+    if rows is None:
+        sys.exit(f"No '{entity}' table in the local store")
+    write_partitions(entity, rows)
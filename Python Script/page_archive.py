@@ -0,0 +1,185 @@
+import os
+import sys
+import gzip
+import sqlite3
+import hashlib
+import time
+from datetime import datetime
+
+import fast_json
+from local_store import STORE_PATH
+
+# === Raw page archive: compressed JSONL per entity and month, one frame per page ===
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC = "zst" if zstandard is not None else "gz"
+ARCHIVE_DIR = os.path.join(os.path.dirname(STORE_PATH), "raw_archive")
+INDEX_PATH = os.path.join(ARCHIVE_DIR, "index.sqlite")
+ID_FIELDS = ["dutyId", "_id", "id", "invoiceNumber"]   # first one present is the record id
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+
+
+def _compress(payload):
+    if CODEC == "zst":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    return gzip.compress(payload, compresslevel=GZIP_LEVEL)
+
+
+def _decompress(frame, codec):
+    if codec == "zst":
+        if zstandard is None:
+            raise RuntimeError("This archive frame is zstd-compressed; install 'zstandard' to read it")
+        return zstandard.ZstdDecompressor().decompress(frame)
+    return gzip.decompress(frame)
+
+
+def _index():
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    conn = sqlite3.connect(INDEX_PATH)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS pages (
+            entity TEXT, partition TEXT, file TEXT, codec TEXT,
+            offset INTEGER, length INTEGER, records INTEGER, sha1 TEXT, fetched_at REAL,
+            PRIMARY KEY (entity, sha1)
+        );
+        CREATE TABLE IF NOT EXISTS records (
+            entity TEXT, record_id TEXT, file TEXT, offset INTEGER, line INTEGER, fetched_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS ix_records_id ON records (entity, record_id);
+        CREATE INDEX IF NOT EXISTS ix_pages_partition ON pages (entity, partition);
+    """)
+    return conn
+
+
+def _record_id(record):
+    for field in ID_FIELDS:
+        value = record.get(field)
+        if value is not None:
+            return str(value)
+    return None
+
+
+def archive_page(entity, records, period=None):
+    """Append one fetched page as a compressed frame; identical pages already archived are skipped.
+
+    `period` is the request's dateRange start (or any ISO date); it picks the YYYY-MM partition.
+    """
+    if not records:
+        return 0
+    payload = b"".join(fast_json.dumps(r) + b"\n" for r in records)
+    digest = hashlib.sha1(payload).hexdigest()
+    partition = (period or datetime.now().isoformat())[:7]
+
+    conn = _index()
+    try:
+        if conn.execute("SELECT 1 FROM pages WHERE entity = ? AND sha1 = ?", (entity, digest)).fetchone():
+            return 0
+        folder = os.path.join(ARCHIVE_DIR, entity)
+        os.makedirs(folder, exist_ok=True)
+        file = os.path.join(entity, f"{partition}.jsonl.{CODEC}")
+        path = os.path.join(ARCHIVE_DIR, file)
+        frame = _compress(payload)
+        offset = os.path.getsize(path) if os.path.exists(path) else 0
+        with open(path, "ab") as f:
+            f.write(frame)
+
+        fetched_at = time.time()
+        with conn:
+            conn.execute(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (entity, partition, file, CODEC, offset, len(frame), len(records), digest, fetched_at),
+            )
+            conn.executemany(
+                "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?)",
+                [(entity, _record_id(r), file, offset, line, fetched_at) for line, r in enumerate(records)],
+            )
+    finally:
+        conn.close()
+    return len(records)
+
+
+def _read_frame(file, offset, length, codec):
+    with open(os.path.join(ARCHIVE_DIR, file), "rb") as f:
+        f.seek(offset)
+        return _decompress(f.read(length), codec).splitlines()
+
+
+def iter_records(entity, partitions=None):
+    """Every archived record of an entity in fetch order (optionally only some YYYY-MM partitions)"""
+    conn = _index()
+    try:
+        sql = "SELECT file, offset, length, codec FROM pages WHERE entity = ?"
+        params = [entity]
+        if partitions:
+            sql += f" AND partition IN ({', '.join('?' * len(partitions))})"
+            params += list(partitions)
+        frames = conn.execute(sql + " ORDER BY fetched_at, file, offset", params).fetchall()
+    finally:
+        conn.close()
+    for file, offset, length, codec in frames:
+        for line in _read_frame(file, offset, length, codec):
+            yield fast_json.loads(line)
+
+
+def load_records(entity, partitions=None):
+    """Latest archived version of each record (by id), ready for pd.json_normalize"""
+    latest = {}
+    anonymous = []
+    for record in iter_records(entity, partitions):
+        record_id = _record_id(record)
+        if record_id is None:
+            anonymous.append(record)
+        else:
+            latest.pop(record_id, None)     # re-insert so order follows the latest fetch
+            latest[record_id] = record
+    return list(latest.values()) + anonymous
+
+
+def get_record(entity, record_id):
+    """Latest archived version of one record, read straight from its frame via the index"""
+    conn = _index()
+    try:
+        row = conn.execute(
+            """
+            SELECT r.file, r.offset, p.length, p.codec, r.line
+            FROM records r JOIN pages p ON p.file = r.file AND p.offset = r.offset
+            WHERE r.entity = ? AND r.record_id = ?
+            ORDER BY r.fetched_at DESC LIMIT 1
+            """,
+            (entity, str(record_id)),
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    file, offset, length, codec, line = row
+    return fast_json.loads(_read_frame(file, offset, length, codec)[line])
+
+
+def summary():
+    """Pages, records and compressed MB per entity"""
+    conn = _index()
+    try:
+        return conn.execute(
+            "SELECT entity, COUNT(*), SUM(records), ROUND(SUM(length) / 1048576.0, 1), MIN(partition), MAX(partition) "
+            "FROM pages GROUP BY entity ORDER BY entity"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+# === Example usage: python page_archive.py [entity [record id]] ===
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        for entity, pages, records, mb, first, last in summary():
+            print(f"{entity}: {pages} pages, {records} records, {mb} MB ({first} → {last})")
+    elif len(sys.argv) == 2:
+        start = time.time()
+        rows = load_records(sys.argv[1])
+        print(f"{len(rows)} latest records of {sys.argv[1]} rebuilt from the archive in {time.time() - start:.1f}s")
+    else:
+        print(get_record(sys.argv[1], sys.argv[2]))
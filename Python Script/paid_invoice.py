@@ -1,11 +1,22 @@
-import requests
-import json
 import time
-import pandas as pd
 from datetime import datetime, timedelta
+import fast_json
+from lazy_imports import LazyModule
+
+# heavy dependencies load on first use
+requests = LazyModule("requests")
+pd = LazyModule("pandas")
 
 # === Import auth handler === 
 from auth_refresh import get_auth_headers   # 👈 uses your existing auth_refresh.py
+from compact_types import excel_ready
+from ist_dates import parse_timestamps
+from data_quality import gate
+from local_store import save_table
+from arrow_outputs import write_arrow
+from month_partitions import write_partitions
+from page_archive import archive_page
+from receivables_aging import settle_paid
 
 # === API DETAILS ===
 API_URL = "https://app.indecab.com/api/beta/invoices"   # 👈 invoices API
@@ -25,7 +36,7 @@ def get_api_data(headers, body, page=1, limit=1000):
         print(f"  Requesting page {page}...")
 
         try:
-            response = requests.post(API_URL, headers=headers, data=json.dumps(body_with_pagination), timeout=120)
+            response = requests.post(API_URL, headers=headers, data=fast_json.dumps(body_with_pagination), timeout=120)
         except requests.exceptions.Timeout:
             print("  Request timed out.")
             break
@@ -36,7 +47,7 @@ def get_api_data(headers, body, page=1, limit=1000):
         # 🔑 If unauthorized (token expired) → refresh and retry once
         if response.status_code == 401:
             print("  ⚠️ Token expired, refreshing...")
-            headers = get_auth_headers()
+            headers = get_auth_headers(force=True)
             continue
 
         if response.status_code != 200:
@@ -47,7 +58,7 @@ def get_api_data(headers, body, page=1, limit=1000):
             print(f"  Error fetching API (page {page}): {response.text}")
             break
 
-        result = response.json()
+        result = fast_json.decode_response(response)
         data_page = result.get("data", [])
 
         print(f"  Received {len(data_page)} records on page {page}")
@@ -61,6 +72,7 @@ def get_api_data(headers, body, page=1, limit=1000):
             break
 
         all_data.extend(data_page)
+        archive_page("paid_invoices", data_page, body["dateRange"]["start"])   # raw page, compressed + indexed
 
         if len(data_page) < limit:
             break
@@ -116,7 +128,13 @@ if __name__ == "__main__":
 
     if all_results:
         df = pd.DataFrame(all_results)
-        df.to_excel(ONEDRIVE_PATH, index=False, engine="openpyxl")
+        parse_timestamps(df)
+        gate("paid_invoices", df)
+        excel_ready(df).to_excel(ONEDRIVE_PATH, index=False, engine="openpyxl")
+        save_table("paid_invoices", df)
+        write_arrow("paid_invoices", df)
+        write_partitions("paid_invoices", df)
         print(f"\n✅ Saved {len(all_results)} PAID invoices to OneDrive: {ONEDRIVE_PATH}")
+        settle_paid(df)
     else:
         print("\n❌ No PAID invoices fetched from API.")
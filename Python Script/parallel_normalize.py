@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from lazy_imports import LazyModule
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
+
+# === Duty flattening shared by billed.py / completed_duties.py ===
+DUTY_RENAMES = {
+    "customer.name": "Customer Name",
+    "customer.id": "Customer ID",
+    "vehicle.number": "Vehicle Number",
+    "vehicle.type": "Vehicle Type",
+}
+BATCH_SIZE = 5000          # duties per worker task
+# measured with bench_normalize.py --costs on 200k duties: in-process 4.1-5.3s, while the parent alone
+# spends ~3.4s pickling duties out and frames back, so the pool wins 1.2-1.5x at best on any core count
+MIN_PARALLEL_ROWS = 300000 # that 0.7-1.8s per 200k ceiling gain must also pay for worker start-up (spawn + pandas)
+MIN_WORKERS = 4            # workers also unpickle + re-pickle (~1x in-process time): 2 workers gain ~nothing
+
+
+def normalize_duty_batch(duties):
+    """Flatten one batch of duties into (duties frame, exploded invoices frame)"""
+    df_duties = pd.json_normalize(duties)
+    df_duties.rename(columns=DUTY_RENAMES, inplace=True)
+
+    invoices_records = []
+    for duty in duties:
+        duty_id = duty.get("dutyId")
+        invoices = duty.get("invoices", [])
+        if isinstance(invoices, list):
+            for inv in invoices:
+                inv_record = {"dutyId": duty_id}
+                inv_record.update(inv)  # merge invoice fields
+                invoices_records.append(inv_record)
+
+    df_invoices = pd.DataFrame(invoices_records) if invoices_records else pd.DataFrame()
+    return df_duties, df_invoices
+
+
+def _batches(records, batch_size):
+    for start in range(0, len(records), batch_size):
+        yield records[start:start + batch_size]
+
+
+def normalize_duties(all_results, workers=None, batch_size=BATCH_SIZE, force=False):
+    """Flatten duties, on a process pool for large histories on 4+ cores (force=True always pools).
+
+    Chunks are concatenated in their original order, so the output matches the in-process path.
+    """
+    workers = workers or os.cpu_count() or 1
+    small = workers < MIN_WORKERS or len(all_results) < MIN_PARALLEL_ROWS
+    if workers <= 1 or (small and not force):
+        return normalize_duty_batch(all_results)
+
+    print(f"  ⚙️ Normalizing {len(all_results)} duties on {workers} processes...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields results in submission order, so row order is preserved
+        chunks = list(pool.map(normalize_duty_batch, _batches(all_results, batch_size), chunksize=1))
+
+    df_duties = pd.concat([c[0] for c in chunks], ignore_index=True)
+    invoice_chunks = [c[1] for c in chunks if not c[1].empty]
+    df_invoices = pd.concat(invoice_chunks, ignore_index=True) if invoice_chunks else pd.DataFrame()
+    return df_duties, df_invoices
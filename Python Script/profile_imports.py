@@ -0,0 +1,59 @@
+import re
+import sys
+import subprocess
+import time
+
+# Scripts / helpers to profile (module names, run from this folder)
+MODULES = [
+    "auth_refresh",
+    "dispatched",
+    "dispatched_total",
+    "billed",
+    "completed_duties",
+    "driver",
+    "vehicles",
+    "supplier",
+]
+TOP_N = 5
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_module(module):
+    """Import `module` in a fresh interpreter with -X importtime; return (wall seconds, direct imports)"""
+    start = time.time()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    wall = time.time() - start
+    # -X importtime prints children before their parent, one indent level deeper
+    pending = []
+    direct = []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, name = match.groups()
+        depth = len(indent)
+        children = []
+        while pending and pending[-1][2] > depth:
+            child = pending.pop()
+            if child[2] == depth + 2:
+                children.append(child[:2])
+        if name == module:
+            direct = children
+        pending.append((name, int(cumulative_us), depth))
+    if proc.returncode != 0:
+        print(f"  ⚠️ import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    return wall, direct
+
+
+if __name__ == "__main__":
+    modules = sys.argv[1:] or MODULES
+    for module in modules:
+        wall, direct = profile_module(module)
+        heaviest = sorted(direct, key=lambda r: r[1], reverse=True)[:TOP_N]
+        print(f"\n{module}: interpreter + import {wall * 1000:.0f} ms")
+        for name, cumulative_us in heaviest:
+            print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
@@ -0,0 +1,197 @@
+import time
+from lazy_imports import LazyModule
+
+from compact_types import excel_ready
+from ist_dates import LOCAL_TZ, date_key
+from local_store import load_table, save_table
+
+# heavy dependencies load on first use
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# === PATH TO SAVE FILE IN ONEDRIVE ===
+ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\receivables_aging.xlsx"
+
+# === Aging buckets: days past the aging date, upper edges inclusive ===
+BUCKET_EDGES = [30, 60, 90]
+BUCKET_LABELS = ["0-30", "31-60", "61-90", "90+"]
+
+# === Column names in the invoices payload (first one present wins) ===
+INVOICE_ID_CANDIDATES = ["_id", "id", "invoiceId", "invoiceNumber"]
+CUSTOMER_CANDIDATES = ["customer.name", "customerName", "Customer Name", "customer"]
+AGING_DATE_CANDIDATES = ["dueDate", "invoiceDate", "date"]   # due date first, else invoice date
+OUTSTANDING_CANDIDATES = ["balance", "balanceAmount", "amountDue", "dueAmount", "outstanding"]
+AMOUNT_CANDIDATES = ["amount", "totalAmount", "grandTotal", "total"]
+PAID_CANDIDATES = ["amountPaid", "paidAmount", "amountReceived"]
+
+LEDGER_TABLE = "receivables_open"
+LEDGER_COLUMNS = ["invoiceKey", "customer", "agingDate", "outstanding"]
+
+
+def _first_present(df, candidates):
+    for col in candidates:
+        if col in df.columns:
+            return col
+    return None
+
+
+def _customer_names(df):
+    col = _first_present(df, CUSTOMER_CANDIDATES)
+    if col is None:
+        return pd.Series("UNKNOWN", index=df.index, dtype=object)
+    # unflattened payloads keep the customer as a nested {"name": ...} dict
+    names = df[col].map(lambda v: v.get("name") if isinstance(v, dict) else v)
+    return names.fillna("UNKNOWN").astype(str)
+
+
+def _numeric(df, candidates):
+    col = _first_present(df, candidates)
+    return pd.to_numeric(df[col], errors="coerce") if col else None
+
+
+def _as_of(as_of=None):
+    """Aging date as a tz-aware IST timestamp (default: now)"""
+    as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now(tz=LOCAL_TZ)
+    return as_of.tz_localize(LOCAL_TZ) if as_of.tzinfo is None else as_of.tz_convert(LOCAL_TZ)
+
+
+def open_items(df_invoices):
+    """Compact ledger rows (invoiceKey, customer, agingDate, outstanding) from unpaid invoices"""
+    id_col = _first_present(df_invoices, INVOICE_ID_CANDIDATES)
+    date_col = _first_present(df_invoices, AGING_DATE_CANDIDATES)
+    if id_col is None or date_col is None:
+        raise KeyError(f"Invoices need an id {INVOICE_ID_CANDIDATES} and a date {AGING_DATE_CANDIDATES}")
+
+    outstanding = _numeric(df_invoices, OUTSTANDING_CANDIDATES)
+    if outstanding is None:
+        outstanding = _numeric(df_invoices, AMOUNT_CANDIDATES)
+        paid = _numeric(df_invoices, PAID_CANDIDATES)
+        if outstanding is None:
+            raise KeyError(f"Invoices need an amount {OUTSTANDING_CANDIDATES + AMOUNT_CANDIDATES}")
+        if paid is not None:
+            outstanding = outstanding - paid.fillna(0)
+
+    # invoices without a due date age from their invoice date
+    aging_date = df_invoices[date_col]
+    fallback = _first_present(df_invoices, AGING_DATE_CANDIDATES[1:])
+    if fallback and fallback != date_col:
+        aging_date = aging_date.fillna(df_invoices[fallback])
+
+    ledger = pd.DataFrame({
+        "invoiceKey": df_invoices[id_col].astype(str),
+        "customer": _customer_names(df_invoices),
+        "agingDate": aging_date,
+        "outstanding": outstanding.fillna(0).astype("float64"),
+    })
+    return ledger.drop_duplicates("invoiceKey", keep="last")
+
+
+class ReceivablesLedger:
+    """Open invoices keyed by invoiceKey; unpaid syncs upsert, paid syncs settle.
+
+    Aging is recomputed from the compact ledger on demand (one vectorized pass),
+    so buckets stay correct as invoices get older between syncs.
+    """
+
+    def __init__(self, ledger=None):
+        ledger = ledger if ledger is not None else pd.DataFrame(columns=LEDGER_COLUMNS)
+        self.ledger = ledger[LEDGER_COLUMNS].set_index("invoiceKey")
+
+    @classmethod
+    def load(cls):
+        """Ledger as left by the last sync (empty if none yet)"""
+        return cls(load_table(LEDGER_TABLE, LEDGER_COLUMNS))
+
+    def save(self):
+        save_table(LEDGER_TABLE, self.ledger.reset_index())
+
+    def upsert_unpaid(self, df_unpaid, full_refresh=False):
+        """Add or update open invoices; a full refresh also drops keys no longer unpaid"""
+        items = open_items(df_unpaid).set_index("invoiceKey")
+        items = items[items["outstanding"] > 0]
+        if full_refresh or self.ledger.empty:
+            self.ledger = items
+        else:
+            kept = self.ledger[~self.ledger.index.isin(items.index)]
+            self.ledger = pd.concat([kept, items])
+        return len(items)
+
+    def settle(self, df_paid):
+        """Drop invoices that have moved to paid; returns how many were open"""
+        id_col = _first_present(df_paid, INVOICE_ID_CANDIDATES)
+        if id_col is None or self.ledger.empty:
+            return 0
+        settled = self.ledger.index.isin(df_paid[id_col].astype(str))
+        self.ledger = self.ledger[~settled]
+        return int(settled.sum())
+
+    def aged(self, as_of=None):
+        """Ledger rows with days outstanding and bucket as of a date (default: now, IST)"""
+        as_of = _as_of(as_of)
+        aged = self.ledger.reset_index()
+        aging_date = pd.to_datetime(aged["agingDate"], utc=True).dt.tz_convert(LOCAL_TZ)
+        days = (as_of.normalize() - aging_date.dt.normalize()).dt.days
+        days = days.fillna(0).clip(lower=0).astype("int32")   # not yet due counts as current
+        aged["daysOutstanding"] = days
+        aged["bucket"] = pd.Categorical.from_codes(
+            np.searchsorted(BUCKET_EDGES, days.to_numpy(), side="left"), BUCKET_LABELS
+        )
+        return aged
+
+    def aging_fact(self, as_of=None):
+        """Compact fact: one row per customer x bucket with invoice count and outstanding"""
+        aged = self.aged(as_of)
+        fact = (
+            aged.groupby(["customer", "bucket"], observed=True)
+            .agg(invoices=("invoiceKey", "size"), outstanding=("outstanding", "sum"))
+            .reset_index()
+        )
+        fact.insert(0, "asOfDateKey", int(date_key(pd.Series([_as_of(as_of)])).iloc[0]))
+        fact["outstanding"] = fact["outstanding"].round(2)
+        return fact
+
+    def customer_summary(self, as_of=None):
+        """Per-customer outstanding with one column per bucket"""
+        fact = self.aging_fact(as_of)
+        wide = fact.pivot_table(
+            index="customer", columns="bucket", values="outstanding", aggfunc="sum", fill_value=0, observed=False
+        ).reindex(columns=BUCKET_LABELS, fill_value=0)
+        wide.columns = [str(c) for c in wide.columns]
+        wide["total_outstanding"] = wide.sum(axis=1)
+        return wide.sort_values("total_outstanding", ascending=False).reset_index()
+
+
+def export_aging(ledger, as_of=None):
+    """Persist the ledger and write the aging fact + customer view"""
+    start = time.time()
+    ledger.save()
+    fact = ledger.aging_fact(as_of)
+    summary = ledger.customer_summary(as_of)
+    save_table("receivables_aging", fact)
+    with pd.ExcelWriter(ONEDRIVE_PATH, engine="openpyxl") as writer:
+        excel_ready(summary).to_excel(writer, sheet_name="By Customer", index=False)
+        excel_ready(fact).to_excel(writer, sheet_name="Aging Fact", index=False)
+    print(f"\n📒 Receivables: {len(ledger.ledger)} open invoices, "
+          f"₹{ledger.ledger['outstanding'].sum():,.2f} outstanding ({time.time() - start:.2f}s)")
+    print(f"✅ Saved receivables aging to: {ONEDRIVE_PATH}")
+    return fact
+
+
+def refresh_from_unpaid(df_unpaid):
+    """Full unpaid sync: rebuild the ledger from the complete unpaid list"""
+    ledger = ReceivablesLedger.load()
+    ledger.upsert_unpaid(df_unpaid, full_refresh=True)
+    return export_aging(ledger)
+
+
+def settle_paid(df_paid):
+    """Paid sync: remove newly paid invoices from the ledger and re-age"""
+    ledger = ReceivablesLedger.load()
+    settled = ledger.settle(df_paid)
+    print(f"\n💸 {settled} open invoices moved to paid")
+    return export_aging(ledger)
+
+
+# === Example usage: re-age the stored ledger as of today ===
+if __name__ == "__main__":
+    export_aging(ReceivablesLedger.load())
@@ -1,11 +1,21 @@
-import requests
-import json
 import time
-import pandas as pd
 from datetime import datetime, timedelta
+import fast_json
+from lazy_imports import LazyModule
+
+# heavy dependencies load on first use
+requests = LazyModule("requests")
+pd = LazyModule("pandas")
 
 # === Import auth handler ===
 from auth_refresh import get_auth_headers   # uses your existing token refresh logic
+from compact_types import excel_ready
+from ist_dates import parse_timestamps
+from data_quality import gate
+from local_store import save_table
+from arrow_outputs import write_arrow
+from month_partitions import write_partitions
+from page_archive import archive_page
 
 # === API DETAILS ===
 API_URL = "https://app.indecab.com/api/beta/receipts"
@@ -27,7 +37,7 @@ def get_api_data(headers, body, page=1, limit=100):
         print(f"  Requesting page {page}...")
 
         try:
-            response = requests.post(API_URL, headers=headers, data=json.dumps(body_paged), timeout=120)
+            response = requests.post(API_URL, headers=headers, data=fast_json.dumps(body_paged), timeout=120)
         except requests.exceptions.Timeout:
             print("  Request timeout")
             break
@@ -38,7 +48,7 @@ def get_api_data(headers, body, page=1, limit=100):
         # --- Handle expired token ---
         if response.status_code == 401:
             print("  ⚠️ Token expired. Refreshing...")
-            headers = get_auth_headers()
+            headers = get_auth_headers(force=True)
             continue
 
         # --- Rate limit handling ---
@@ -51,7 +61,7 @@ def get_api_data(headers, body, page=1, limit=100):
             print(f"  Error: {response.text}")
             break
 
-        result = response.json()
+        result = fast_json.decode_response(response)
         data_page = result.get("data", [])
 
         print(f"  Received {len(data_page)} records")
@@ -65,6 +75,7 @@ def get_api_data(headers, body, page=1, limit=100):
             break
 
         all_data.extend(data_page)
+        archive_page("receipts", data_page, body["dateRange"]["start"])   # raw page, compressed + indexed
 
         if len(data_page) < limit:
             break
@@ -130,15 +141,21 @@ if __name__ == "__main__":
     # === Save to Excel ===
     if all_results:
         df_receipts = pd.json_normalize(all_results)
+        parse_timestamps(df_receipts)
+        gate("receipts", df_receipts)
 
         with pd.ExcelWriter(ONEDRIVE_PATH, engine="openpyxl") as writer:
 
             chunks = split_dataframe(df_receipts, 80000)
             for i, chunk in enumerate(chunks, start=1):
                 sheet_name = f"Receipts_{i}"
-                chunk.to_excel(writer, sheet_name=sheet_name, index=False)
+                excel_ready(chunk).to_excel(writer, sheet_name=sheet_name, index=False)
                 print(f"✔ Wrote {len(chunk)} rows to sheet '{sheet_name}'")
 
+        save_table("receipts", df_receipts)
+        write_arrow("receipts", df_receipts)
+        write_partitions("receipts", df_receipts)
+
         print(f"\n✅ DONE! Saved {len(all_results)} receipts → {ONEDRIVE_PATH}")
 
     else:
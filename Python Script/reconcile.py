@@ -0,0 +1,259 @@
+import sys
+import json
+import time
+from lazy_imports import LazyModule
+
+from base_rate_pricing import normalize_key
+from compact_types import excel_ready
+from local_store import load_table, save_table
+
+# heavy dependencies load on first use
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# === PATH TO SAVE FILE IN ONEDRIVE ===
+ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\reconciliation.xlsx"
+
+# === Store tables produced by the extractors ===
+INVOICE_TABLES = ["unpaid_invoices", "paid_invoices"]
+RECEIPT_TABLE = "receipts"
+NOTE_TABLE = "credit_notes"
+
+# === Column names (first one present wins) ===
+INVOICE_ID_CANDIDATES = ["_id", "id", "invoiceId"]
+INVOICE_NUMBER_CANDIDATES = ["invoiceNumber", "number"]
+DOC_ID_CANDIDATES = ["_id", "id", "receiptNumber", "noteNumber", "number"]
+# what a receipt / note says it settles: an invoice id or an invoice number
+REFERENCE_CANDIDATES = [
+    "invoiceId", "invoice._id", "invoice.id", "invoiceNumber", "invoice.invoiceNumber", "reference", "referenceNumber",
+]
+CUSTOMER_CANDIDATES = ["customer.name", "customerName", "Customer Name", "customer"]
+AMOUNT_CANDIDATES = ["amount", "totalAmount", "grandTotal", "total", "amountReceived"]
+NOTE_TYPE_CANDIDATES = ["noteType", "type"]
+# normalised note type (lowercase, no spaces / '_' / '-', trailing 'note' dropped) -> doc_kind
+NOTE_KINDS = {"credit": "credit_note", "cr": "credit_note", "debit": "debit_note", "dr": "debit_note"}
+DOC_SIGNS = {"receipt": -1, "credit_note": -1, "debit_note": 1}
+
+AMOUNT_TOLERANCE = 1.0    # rupees; customer + amount matches must agree within this
+
+
+def _first_present(df, candidates):
+    for col in candidates:
+        if col in df.columns:
+            return col
+    return None
+
+
+def _customer_value(v):
+    # invoices are stored unflattened, so the customer is a dict or its JSON text
+    if isinstance(v, str) and v.startswith("{"):
+        try:
+            v = json.loads(v)
+        except ValueError:
+            return v
+    return v.get("name") if isinstance(v, dict) else v
+
+
+def _customer_keys(df):
+    col = _first_present(df, CUSTOMER_CANDIDATES)
+    if col is None:
+        return pd.Series("", index=df.index, dtype=object)
+    # decode each distinct customer once (code -1 = missing -> trailing None)
+    codes, uniques = pd.factorize(df[col])
+    names = np.array([_customer_value(v) for v in uniques] + [None], dtype=object)
+    return normalize_key(pd.Series(names[codes], index=df.index, dtype=object))
+
+
+def _text_keys(df, col):
+    """Column as str keys with missing values kept missing (never the text 'nan')"""
+    if col is None:
+        return pd.Series(None, index=df.index, dtype=object)
+    return df[col].astype(str).where(df[col].notna())
+
+
+def _amounts(df):
+    col = _first_present(df, AMOUNT_CANDIDATES)
+    if col is None:
+        return pd.Series(np.nan, index=df.index)
+    return pd.to_numeric(df[col], errors="coerce")
+
+
+def invoice_frame(*frames):
+    """Invoices from every invoice table as (invoiceKey, invoiceNumber, customer_key, amount)"""
+    parts = []
+    for df in frames:
+        if df is None or df.empty:
+            continue
+        id_col = _first_present(df, INVOICE_ID_CANDIDATES)
+        number_col = _first_present(df, INVOICE_NUMBER_CANDIDATES)
+        parts.append(pd.DataFrame({
+            "invoiceKey": _text_keys(df, id_col or number_col),
+            "invoiceNumber": _text_keys(df, number_col),
+            "customer_key": _customer_keys(df),
+            "invoice_amount": _amounts(df),
+        }))
+    if not parts:
+        return pd.DataFrame(columns=["invoiceKey", "invoiceNumber", "customer_key", "invoice_amount"])
+    invoices = pd.concat(parts, ignore_index=True).dropna(subset=["invoiceKey"])
+    return invoices.drop_duplicates("invoiceKey", keep="first", ignore_index=True)
+
+
+def _note_kinds(types, default):
+    """Map free-text note types to doc_kind; blanks take the default, anything else unknown raises"""
+    text = types.astype("string").str.strip().str.lower()
+    text = text.str.replace(r"[\s_\-]+", "", regex=True).str.replace(r"note$", "", regex=True)
+    kinds = text.map(NOTE_KINDS)
+    unknown = text.notna() & (text != "") & kinds.isna()
+    if unknown.any():
+        raise ValueError(f"Unmapped note types {sorted(types[unknown].astype(str).unique())} — add them to NOTE_KINDS")
+    return kinds.fillna(default).astype(object)
+
+
+def document_frame(df, kind):
+    """Receipts or notes as (doc_kind, docKey, reference, customer_key, amount)"""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["doc_kind", "docKey", "reference", "customer_key", "doc_amount"])
+    id_col = _first_present(df, DOC_ID_CANDIDATES)
+    ref_col = _first_present(df, REFERENCE_CANDIDATES)
+    amount = _amounts(df)
+    doc_kind = pd.Series(kind, index=df.index, dtype=object)
+    type_col = _first_present(df, NOTE_TYPE_CANDIDATES) if kind != "receipt" else None
+    if type_col:
+        doc_kind = _note_kinds(df[type_col], kind)
+    return pd.DataFrame({
+        "doc_kind": doc_kind,
+        "docKey": df[id_col].astype(str) if id_col else df.index.astype(str),
+        "reference": _text_keys(df, ref_col),
+        "customer_key": _customer_keys(df),
+        "doc_amount": amount,
+    })
+
+
+def _match_by_reference(docs, invoices):
+    """Hash lookup of each document's reference against invoice ids and numbers"""
+    by_id = pd.Series(invoices.index, index=invoices["invoiceKey"])
+    by_number = pd.Series(invoices.index, index=invoices["invoiceNumber"]).loc[lambda s: ~s.index.duplicated()]
+    position = docs["reference"].map(by_id[~by_id.index.duplicated()])
+    position = position.fillna(docs["reference"].map(by_number))
+    return position
+
+
+def _match_by_amount(docs, invoices):
+    """Customer + amount join within AMOUNT_TOLERANCE, one invoice per document (closest first)"""
+    if docs.empty or invoices.empty:
+        return pd.Series(np.nan, index=docs.index)
+    # hash on (customer, amount bucket) and probe the neighbouring buckets for the tolerance
+    inv = pd.DataFrame({
+        "customer_key": invoices["customer_key"],
+        "bucket": np.floor(invoices["invoice_amount"] / AMOUNT_TOLERANCE),
+        "invoice_amount": invoices["invoice_amount"],
+        "inv_pos": invoices.index,
+    }).dropna(subset=["bucket"])
+    probe = pd.DataFrame({
+        "customer_key": docs["customer_key"],
+        "bucket": np.floor(docs["doc_amount"].abs() / AMOUNT_TOLERANCE),
+        "doc_amount": docs["doc_amount"].abs(),
+        "doc_pos": docs.index,
+    }).dropna(subset=["bucket"])
+    probe = pd.concat([probe.assign(bucket=probe["bucket"] + offset) for offset in (-1, 0, 1)], ignore_index=True)
+
+    pairs = probe.merge(inv, on=["customer_key", "bucket"], how="inner")
+    pairs["diff"] = (pairs["doc_amount"] - pairs["invoice_amount"]).abs()
+    pairs = pairs[pairs["diff"] <= AMOUNT_TOLERANCE].sort_values(["diff", "doc_pos", "inv_pos"])
+    # greedy one-to-one: closest pairs claim their document and invoice first; a document whose
+    # best invoice was taken falls through to its next-best free one
+    used_docs, used_invoices, matches = set(), set(), {}
+    for doc, inv in zip(pairs["doc_pos"].tolist(), pairs["inv_pos"].tolist()):
+        if doc in used_docs or inv in used_invoices:
+            continue
+        used_docs.add(doc)
+        used_invoices.add(inv)
+        matches[doc] = inv
+    return pd.Series(matches, dtype="float64").reindex(docs.index)
+
+
+def reconcile(invoices, docs):
+    """Match documents to invoices: by reference first, then by customer + amount"""
+    docs = docs.reset_index(drop=True)
+    position = _match_by_reference(docs, invoices)
+    docs["match_rule"] = np.where(position.notna(), "reference", None)
+
+    # amount matching only considers invoices nothing has claimed by reference
+    open_invoices = invoices[~invoices.index.isin(position.dropna())]
+    unmatched = position.isna()
+    by_amount = _match_by_amount(docs[unmatched], open_invoices)
+    position[unmatched] = by_amount
+    docs.loc[unmatched & position.notna(), "match_rule"] = "customer+amount"
+
+    matched = docs[position.notna()].copy()
+    matched_invoices = invoices.loc[position.dropna().astype(int).to_numpy()].reset_index(drop=True)
+    matched = pd.concat([
+        matched.reset_index(drop=True),
+        matched_invoices[["invoiceKey", "invoiceNumber", "invoice_amount"]],
+    ], axis=1)
+    matched["amount_diff"] = (matched["doc_amount"].abs() - matched["invoice_amount"]).round(2)
+
+    claimed = invoices["invoiceKey"].isin(matched["invoiceKey"])
+    unmatched_docs = docs[position.isna()].drop(columns=["match_rule"])
+    unmatched_invoices = invoices[~claimed]
+    return matched, unmatched_docs, unmatched_invoices
+
+
+def customer_balances(invoices, docs):
+    """Net balance per customer: invoiced - received - credited + debited"""
+    sign = docs["doc_kind"].map(DOC_SIGNS)
+    if sign.isna().any():
+        raise ValueError(f"Documents without a known kind: {sorted(docs.loc[sign.isna(), 'doc_kind'].astype(str).unique())}")
+    flows = pd.concat([
+        pd.DataFrame({"customer_key": invoices["customer_key"], "kind": "invoiced", "amount": invoices["invoice_amount"]}),
+        pd.DataFrame({"customer_key": docs["customer_key"], "kind": docs["doc_kind"], "amount": docs["doc_amount"].abs() * sign}),
+    ], ignore_index=True)
+    balances = flows.pivot_table(index="customer_key", columns="kind", values="amount", aggfunc="sum", fill_value=0)
+    balances["net_balance"] = balances.sum(axis=1)
+    balances.columns.name = None
+    return balances.round(2).sort_values("net_balance", ascending=False).reset_index()
+
+
+def run_reconciliation():
+    """Load invoices, receipts and notes from the store, reconcile and write the outputs"""
+    start = time.time()
+    invoices = invoice_frame(*(load_table(t) for t in INVOICE_TABLES))
+    docs = pd.concat([
+        document_frame(load_table(RECEIPT_TABLE), "receipt"),
+        document_frame(load_table(NOTE_TABLE), "credit_note"),   # notes without a type are credit notes
+    ], ignore_index=True)
+    print(f"Reconciling {len(docs)} receipts/notes against {len(invoices)} invoices...")
+
+    matched, unmatched_docs, unmatched_invoices = reconcile(invoices, docs)
+    balances = customer_balances(invoices, docs)
+    print(matched["match_rule"].value_counts().to_string())
+    print(f"  unmatched: {len(unmatched_docs)} documents, {len(unmatched_invoices)} invoices")
+
+    save_table("reconciliation_matched", matched)
+    save_table("reconciliation_unmatched_documents", unmatched_docs)
+    save_table("reconciliation_unmatched_invoices", unmatched_invoices)
+    save_table("customer_balances", balances)
+    with pd.ExcelWriter(ONEDRIVE_PATH, engine="openpyxl") as writer:
+        excel_ready(balances).to_excel(writer, sheet_name="Balances", index=False)
+        excel_ready(matched).to_excel(writer, sheet_name="Matched", index=False)
+        excel_ready(unmatched_docs).to_excel(writer, sheet_name="Unmatched Documents", index=False)
+        excel_ready(unmatched_invoices).to_excel(writer, sheet_name="Unmatched Invoices", index=False)
+    print(f"\n✅ Saved reconciliation to: {ONEDRIVE_PATH} ({time.time() - start:.1f}s)")
+    return matched, unmatched_docs, unmatched_invoices, balances
+
+
+def check_amount_matching():
+    """Document 1's best invoice is taken by a closer document 0, so it must fall back to its next-best"""
+    invoices = pd.DataFrame({"customer_key": ["acme", "acme"], "invoice_amount": [100.0, 100.6]})
+    docs = pd.DataFrame({"customer_key": ["acme", "acme"], "doc_amount": [100.0, 100.2]})
+    position = _match_by_amount(docs, invoices)
+    assert position.tolist() == [0, 1], position.tolist()
+    print("✅ customer + amount matching is one-to-one greedy")
+
+
+# === Example usage: python reconcile.py [--check] ===
+if __name__ == "__main__":
+    if "--check" in sys.argv:
+        check_amount_matching()
+    else:
+        run_reconciliation()
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import hashlib
+from lazy_imports import LazyModule
+
+from compact_types import compact_dataframe
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
+
+# === STATIC REFERENCE WORKBOOKS (repo root) ===
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(REPO_DIR, ".reference_cache")
+
+# name -> (workbook, index column or None)
+REFERENCE_TABLES = {
+    "clients": ("Client Table.xlsx", "Customer/Client Name"),
+    "drivers": ("Driver Table.xlsx", "DRIVER"),
+    "suppliers": ("Supplier Table.xlsx", "_id"),
+    "base_rates": ("Base Rate.xlsx", None),
+}
+
+# Tables already loaded in this process
+_LOADED = {}
+
+
+def _cache_format():
+    """Feather when pyarrow is installed, pickle otherwise (both binary, typed)"""
+    try:
+        import pyarrow  # noqa: F401
+        return "feather"
+    except ImportError:
+        return "pickle"
+
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _write_cache(df, cache_path, fmt):
+    if fmt == "feather":
+        # feather stores a default index only; the index is restored on read
+        df.reset_index().to_feather(cache_path)
+    else:
+        df.to_pickle(cache_path)
+
+
+def _read_cache(cache_path, fmt, index_col):
+    if fmt == "feather":
+        df = pd.read_feather(cache_path)
+        return df.set_index(index_col) if index_col else df.drop(columns="index")
+    return pd.read_pickle(cache_path)
+
+
+def _parse_workbook(path, index_col):
+    df = pd.read_excel(path, engine="openpyxl")
+    df.columns = [str(c).strip() for c in df.columns]
+    compact_dataframe(df)
+    if index_col:
+        df = df.drop_duplicates(subset=[index_col], keep="last").set_index(index_col)
+    return df
+
+
+def load_reference(name, refresh=False):
+    """Return a typed (and indexed) reference table, parsing the xlsx only when it changed"""
+    if name not in REFERENCE_TABLES:
+        raise KeyError(f"Unknown reference table '{name}' (known: {', '.join(REFERENCE_TABLES)})")
+    if name in _LOADED and not refresh:
+        return _LOADED[name]
+
+    workbook, index_col = REFERENCE_TABLES[name]
+    xlsx_path = os.path.join(REPO_DIR, workbook)
+    fmt = _cache_format()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_path = os.path.join(CACHE_DIR, f"{name}.{fmt}")
+    meta_path = os.path.join(CACHE_DIR, f"{name}.json")
+
+    stat = os.stat(xlsx_path)
+    meta = _read_meta(meta_path)
+    fresh = (
+        not refresh
+        and meta is not None
+        and meta.get("format") == fmt
+        and os.path.exists(cache_path)
+    )
+    if fresh and (meta.get("mtime") != stat.st_mtime or meta.get("size") != stat.st_size):
+        # mtime moved (copy / OneDrive sync); only re-parse if the bytes differ
+        file_hash = _file_hash(xlsx_path)
+        fresh = meta.get("sha1") == file_hash
+        if fresh:
+            meta.update(mtime=stat.st_mtime, size=stat.st_size)
+            _write_meta(meta_path, meta)
+
+    if fresh:
+        df = _read_cache(cache_path, fmt, index_col)
+    else:
+        start = time.time()
+        df = _parse_workbook(xlsx_path, index_col)
+        _write_cache(df, cache_path, fmt)
+        _write_meta(meta_path, {
+            "workbook": workbook,
+            "format": fmt,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "sha1": _file_hash(xlsx_path),
+            "rows": len(df),
+        })
+        print(f"  📚 Parsed '{workbook}' into {fmt} cache ({len(df)} rows, {time.time() - start:.2f}s)")
+
+    _LOADED[name] = df
+    return df
+
+
+# === Example usage: warm every cache and show the tables ===
+if __name__ == "__main__":
+    for table_name in REFERENCE_TABLES:
+        start = time.time()
+        table = load_reference(table_name)
+        print(f"{table_name}: {table.shape[0]} rows x {table.shape[1]} columns "
+              f"(index={table.index.name}, {(time.time() - start) * 1000:.1f} ms)")
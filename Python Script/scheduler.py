@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import random
+import subprocess
+from datetime import datetime
+
+from auth_refresh import AUTH_DETAILS, get_auth_headers
+from local_store import STORE_PATH
+
+# === Refresh daemon: each entity on its own cadence, one process per script run ===
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.path.join(os.path.dirname(STORE_PATH), "scheduler_state.json")
+LOCK_PATH = os.path.join(os.path.dirname(STORE_PATH), "scheduler.lock")
+LOG_DIR = os.path.join(os.path.dirname(STORE_PATH), "logs")
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+TICK_SECONDS = 5
+JITTER = 0.1                  # next run = start + every + up to 10% of every, so jobs drift apart
+MAX_RUNNING = 2               # concurrent jobs, i.e. concurrent API clients
+FAILURE_RETRY = 10 * MINUTE   # a failed job retries after this (or its cadence, if shorter)
+AUTH_MARGIN = HOUR            # renew the shared token this long before it expires
+
+# job -> scripts run in order (each with its args), cadence and per-step timeout.
+# once an exclusive job is due, nothing else starts until it has run alone.
+JOBS = {
+    "dispatched": {"steps": [["dispatched.py"]], "every": 5 * MINUTE, "timeout": 30 * MINUTE},
+    "dispatched_total": {"steps": [["dispatched_total.py"]], "every": 30 * MINUTE, "timeout": HOUR},
+    "invoices": {"steps": [["unpaid_invoice.py"], ["paid_invoice.py"]], "every": HOUR, "timeout": HOUR},
+    "receipts": {"steps": [["recepits.py"], ["credit_notes.py"]], "every": HOUR, "timeout": HOUR},
+    "masters": {"steps": [["vehicles.py"], ["driver.py"], ["supplier.py"]], "every": DAY, "timeout": HOUR},
+    "fleet": {"steps": [["vehicle_fule.py"], ["vehicle_expenses.py"]], "every": DAY, "timeout": 2 * HOUR},
+    "duties": {"steps": [["billed.py"], ["completed_duties.py"]], "every": DAY, "timeout": 4 * HOUR},
+    "reconciliation": {
+        "steps": [["reconcile.py"], ["vehicle_costs.py", "--full"], ["fleet_anomalies.py", "--full"]],
+        "every": 7 * DAY, "timeout": 2 * HOUR, "exclusive": True,
+    },
+}
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _read_state():
+    try:
+        with open(STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_state(state):
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def acquire_daemon_lock():
+    """Open handle holding an OS lock on LOCK_PATH, or None if another scheduler runs (freed on crash)"""
+    os.makedirs(os.path.dirname(LOCK_PATH), exist_ok=True)
+    handle = open(LOCK_PATH, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def ensure_token():
+    """Keep the on-disk token fresh so job processes reuse it instead of each logging in"""
+    try:
+        get_auth_headers()
+        if time.time() > AUTH_DETAILS["expiry"] - AUTH_MARGIN:
+            get_auth_headers(force=True)
+    except Exception as e:
+        print(f"⚠️ [{_now()}] Token refresh failed ({e}) — jobs will log in themselves")
+
+
+def next_due(every, started_at):
+    return started_at + every + random.uniform(0, every * JITTER)
+
+
+class Scheduler:
+    """Starts due jobs, runs their steps one after another and never overlaps a job with itself"""
+
+    def __init__(self, jobs=JOBS):
+        self.jobs = jobs
+        self.state = _read_state()
+        self.running = {}   # job -> {"process", "step", "started", "log"}
+        now = time.time()
+        for name, job in jobs.items():
+            entry = self.state.setdefault(name, {})
+            # first run ever: spread start-up over a minute instead of firing everything at once;
+            # exclusive (full-history) jobs wait one cadence so the regular pulls have landed
+            first = next_due(job["every"], now) if job.get("exclusive") else now + random.uniform(0, min(job["every"], MINUTE))
+            entry.setdefault("next_due", first)
+
+    def _due(self, now):
+        due = [name for name in self.jobs if name not in self.running and self.state[name]["next_due"] <= now]
+        return sorted(due, key=lambda name: self.jobs[name]["every"])   # freshest-cadence jobs first
+
+    def _can_start(self, name):
+        if any(self.jobs[other].get("exclusive") for other in self.running):
+            return False
+        if self.jobs[name].get("exclusive"):
+            return not self.running
+        return len(self.running) < MAX_RUNNING
+
+    def _start_step(self, name, step):
+        script, *args = self.jobs[name]["steps"][step]
+        os.makedirs(LOG_DIR, exist_ok=True)
+        log = open(os.path.join(LOG_DIR, f"{name}.log"), "a", encoding="utf-8")
+        log.write(f"\n===== {_now()} {' '.join([script, *args])} =====\n")
+        log.flush()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(SCRIPT_DIR, script), *args],
+            cwd=SCRIPT_DIR, stdout=log, stderr=subprocess.STDOUT,
+            env=dict(os.environ, PYTHONIOENCODING="utf-8"),
+        )
+        run = self.running.setdefault(name, {"started": time.time()})
+        run.update(process=process, step=step, log=log, step_started=time.time())
+
+    def start(self, name):
+        ensure_token()
+        print(f"▶️ [{_now()}] {name}")
+        self.state[name]["last_start"] = time.time()
+        self._start_step(name, 0)
+
+    def _finish(self, name, exit_code):
+        run = self.running.pop(name)
+        job, entry = self.jobs[name], self.state[name]
+        elapsed = time.time() - run["started"]
+        entry.update(last_end=time.time(), exit_code=exit_code, seconds=round(elapsed, 1))
+        if exit_code == 0:
+            entry["next_due"] = next_due(job["every"], run["started"])
+            print(f"✅ [{_now()}] {name} finished in {elapsed:.0f}s")
+        else:
+            entry["next_due"] = time.time() + min(job["every"], FAILURE_RETRY)
+            print(f"❌ [{_now()}] {name} failed (exit {exit_code}) after {elapsed:.0f}s — see {LOG_DIR}")
+        _write_state(self.state)
+
+    def poll(self):
+        """Advance running jobs (next step, timeout, completion) and start whatever is due"""
+        now = time.time()
+        for name, run in list(self.running.items()):
+            process, job = run["process"], self.jobs[name]
+            exit_code = process.poll()
+            if exit_code is None:
+                if now - run["step_started"] > job["timeout"]:
+                    print(f"⏱️ [{_now()}] {name}: step {run['step'] + 1} exceeded {job['timeout']}s — killing it")
+                    process.kill()
+                    process.wait()
+                    run["log"].close()
+                    self._finish(name, "timeout")
+                continue
+            run["log"].close()
+            if exit_code == 0 and run["step"] + 1 < len(job["steps"]):
+                self._start_step(name, run["step"] + 1)
+            else:
+                self._finish(name, exit_code)
+
+        due = self._due(now)
+        draining = any(self.jobs[name].get("exclusive") for name in due)
+        for name in due:
+            if draining and not self.jobs[name].get("exclusive"):
+                continue   # let running jobs drain so the exclusive job can start
+            if self._can_start(name):
+                self.start(name)
+
+    def stop(self):
+        for name, run in self.running.items():
+            print(f"⏹️ Stopping {name}")
+            run["process"].terminate()
+            run["process"].wait()
+            run["log"].close()
+        _write_state(self.state)
+
+    def run_forever(self):
+        print(f"🗓️ Scheduler started with {len(self.jobs)} jobs (state: {STATE_PATH})")
+        try:
+            while True:
+                self.poll()
+                time.sleep(TICK_SECONDS)
+        except KeyboardInterrupt:
+            self.stop()
+
+
+def print_status():
+    state = _read_state()
+    for name, job in JOBS.items():
+        entry = state.get(name, {})
+        last = datetime.fromtimestamp(entry["last_start"]).strftime("%Y-%m-%d %H:%M") if "last_start" in entry else "never"
+        due = datetime.fromtimestamp(entry["next_due"]).strftime("%Y-%m-%d %H:%M") if "next_due" in entry else "now"
+        print(f"{name:18} every {job['every'] // 60:>5} min | last {last} (exit {entry.get('exit_code', '-')}) | next {due}")
+
+
+# === Example usage: python scheduler.py [--status | --now <job>] ===
+if __name__ == "__main__":
+    if "--status" in sys.argv:
+        print_status()
+        sys.exit(0)
+    now_job = None
+    if "--now" in sys.argv:
+        position = sys.argv.index("--now") + 1
+        now_job = sys.argv[position] if position < len(sys.argv) else None
+        if now_job not in JOBS:
+            sys.exit(f"Unknown job '{now_job}'. Valid jobs: {', '.join(JOBS)}")
+    lock = acquire_daemon_lock()
+    if lock is None:
+        sys.exit("Another scheduler is already running.")
+    scheduler = Scheduler()
+    if now_job:
+        scheduler.state[now_job]["next_due"] = 0
+    scheduler.run_forever()
@@ -0,0 +1,101 @@
+import fast_json
+
+# === Incremental parsing with field projection (ijson when installed) ===
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+RECORDS_PREFIX = "data.item"   # records live in {"data": [...]}
+CHUNK_SIZE = 64 * 1024
+CONTAINER_START = {"start_map", "start_array"}
+CONTAINER_END = {"end_map", "end_array"}
+
+
+def get_by_path(obj, path):
+    """Nested value by dot-path (None if any level is missing or not a dict)"""
+    cur = obj
+    for p in path.split("."):
+        if not isinstance(cur, dict):
+            return None
+        cur = cur.get(p)
+        if cur is None:
+            return None
+    return cur
+
+
+def set_by_path(obj, path, value):
+    """Set a nested value by dot-path, creating the intermediate dicts"""
+    parts = path.split(".")
+    cur = obj
+    for p in parts[:-1]:
+        cur = cur.setdefault(p, {})
+    cur[parts[-1]] = value
+
+
+def project_record(record, fields):
+    """Keep only `fields` of a fully decoded record, nested like the original"""
+    projected = {}
+    for path in fields:
+        value = get_by_path(record, path)
+        if value is not None:
+            set_by_path(projected, path, value)
+    return projected
+
+
+def _iter_projected_events(events, fields):
+    """Build projected records from an ijson event stream, skipping everything else"""
+    wanted = {f"{RECORDS_PREFIX}.{path}": path for path in fields}
+    record = None
+    builder = None       # ObjectBuilder for a projected dict/list value
+    builder_path = None
+    depth = 0
+
+    for prefix, event, value in events:
+        if builder is not None:
+            builder.event(event, value)
+            if event in CONTAINER_START:
+                depth += 1
+            elif event in CONTAINER_END:
+                depth -= 1
+                if depth == 0:
+                    set_by_path(record, builder_path, builder.value)
+                    builder = None
+            continue
+
+        if prefix == RECORDS_PREFIX:
+            if event == "start_map":
+                record = {}
+            elif event == "end_map":
+                yield record
+                record = None
+            continue
+
+        if record is None or prefix not in wanted:
+            continue
+        if event in CONTAINER_START:
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            builder_path = wanted[prefix]
+            depth = 1
+        elif event != "null":
+            set_by_path(record, wanted[prefix], value)
+
+
+def stream_projected(response, fields):
+    """Parse a streamed requests response into projected records as bytes arrive.
+
+    Needs the request to be made with stream=True. Without ijson the body is
+    decoded in full and projected afterwards (same records, no memory saving).
+    Raises ValueError on malformed JSON, like response.json().
+    """
+    if ijson is None:
+        result = fast_json.decode_response(response)
+        return [project_record(r, fields) for r in result.get("data") or []]
+
+    response.raw.decode_content = True   # let urllib3 undo gzip/deflate
+    events = ijson.parse(response.raw, buf_size=CHUNK_SIZE, use_float=True)
+    try:
+        return list(_iter_projected_events(events, fields))
+    except ijson.JSONError as e:
+        raise ValueError(f"Malformed JSON stream: {e}") from e
@@ -1,67 +1,16 @@
-import requests
-import time
+import sys
 import json
-import pandas as pd
+from lazy_imports import LazyModule
 from auth_refresh import get_auth_headers  # your token fetcher
+from master_fetch import fetch_master
+from master_history import record_versions
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
 
 API_URL = "https://app.indecab.com/api/beta/suppliers"
 ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\suppliers.xlsx"
 
-def get_api_data(headers, limit=1000, sleep_between_pages=0.2):
-    all_data = []
-    page = 1
-    total_expected = None
-    MAX_RETRIES = 3
-
-    while True:
-        params = {"page": page, "limit": limit}
-        print(f"Requesting page {page} (limit={limit})...")
-        response = None
-        for attempt in range(MAX_RETRIES):
-            try:
-                response = requests.get(API_URL, headers=headers, params=params, timeout=60)
-                break
-            except requests.exceptions.Timeout:
-                print(f"  Timeout attempt {attempt+1}/{MAX_RETRIES} — retrying...")
-                time.sleep(5)
-        if response is None:
-            print("  Failed to get response after retries.")
-            break
-
-        if response.status_code != 200:
-            print(f"  Error {response.status_code}: {response.text[:500]}")
-            break
-
-        try:
-            result = response.json()
-        except ValueError:
-            print("  Non-JSON response, stopping.")
-            break
-
-        data_page = result.get("data") or []
-        meta = result.get("meta") or {}
-        if total_expected is None:
-            total_expected = meta.get("total")
-
-        print(f"  Received {len(data_page)} records on page {page} — collected so far: {len(all_data) + len(data_page)} (meta.total={total_expected})")
-
-        # extend and progress
-        all_data.extend(data_page)
-
-        # stop conditions
-        if total_expected and len(all_data) >= int(total_expected):
-            print(f"  ✅ Reached meta.total ({total_expected}). Stopping pagination.")
-            break
-
-        if len(data_page) < limit:
-            print("  ✅ Last page detected (less than limit). Stopping pagination.")
-            break
-
-        page += 1
-        time.sleep(sleep_between_pages)
-
-    return all_data, total_expected
-
 # helper: get nested value by dot-path (safe)
 def get_by_path(obj, path):
     cur = obj
@@ -112,7 +61,9 @@ def expand_list_column(all_data, path):
 if __name__ == "__main__":
     headers = get_auth_headers()
     print("Fetching all vehicles (full export)...")
-    all_data, total_expected = get_api_data(headers, limit=1000)
+    all_data, total_expected = fetch_master("suppliers", API_URL, headers, force="--full" in sys.argv)
+    if all_data is None:
+        raise SystemExit(0)   # unchanged since the last run: history and exports are current
 
     if not all_data:
         print("No data returned.")
@@ -160,6 +111,8 @@ if __name__ == "__main__":
             # write
             df_expanded.to_excel(writer, sheet_name=f"exp_{safe_name}", index=False)
 
+    record_versions("suppliers", df_flat)   # SCD2: only new / changed records are written
+
     print("\n✅ Export finished.")
     print(f"Main rows: {len(df_flat)}, written to sheet 'vehicles_flat'.")
     if list_cols:
@@ -0,0 +1,216 @@
+import sys
+import time
+from lazy_imports import LazyModule
+
+from compact_types import excel_ready
+from local_store import connect, load_table, save_table, table_columns
+from month_partitions import partition_digest, row_hashes
+
+# heavy dependencies load on first use
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# === PATH TO SAVE FILE IN ONEDRIVE ===
+ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\vehicle_costs.xlsx"
+
+# === Source tables in the local store ===
+FUEL_TABLE = "vehicle_fuels"
+EXPENSE_TABLE = "vehicle_expenses"
+DUTY_TABLE = "billed_duties"
+INVOICE_TABLE = "billed_invoices"
+DUTY_DATE_COL = "pickUpTime"
+
+# === Column names (first one present wins) ===
+VEHICLE_CANDIDATES = ["vehicleId", "vehicle._id", "vehicle.id", "vehicle"]
+DATE_CANDIDATES = ["date", "fuelDate", "expenseDate", "createdAt"]
+AMOUNT_CANDIDATES = ["amount", "totalAmount", "total", "cost"]
+LITRES_CANDIDATES = ["quantity", "litres", "liters", "fuelQuantity"]
+KM_CANDIDATES = ["dutySlip.totalKm", "totalKm", "km"]
+INVOICE_ID_CANDIDATES = ["id", "invoiceId", "_id", "invoiceNumber"]
+
+# === Outputs / incremental state ===
+ROLLUP_TABLE = "vehicle_monthly_costs"
+PARTITION_TABLE = "vehicle_cost_partitions"   # (source, monthKey) -> fingerprint of the last rollup
+
+
+def _pick(columns, candidates):
+    for col in candidates:
+        if col in columns:
+            return col
+    return None
+
+
+def _month_filter(column_sql, months):
+    """WHERE clause on an indexed YYYYMMDD column for a set of YYYYMM months (ranges keep the index usable)"""
+    if months is None:
+        return ""
+    ranges = " OR ".join(f"{column_sql} BETWEEN {m * 100} AND {m * 100 + 99}" for m in sorted(months))
+    return f"WHERE {ranges}" if ranges else "WHERE 0"
+
+
+def _source_sql(conn, source, months=None):
+    """SELECT of (vehicleId, monthKey, amount, extra) rows for one source, None if it cannot be built"""
+    if source == "duty":
+        cols = table_columns(DUTY_TABLE, conn)
+        date_key_col = f"{DUTY_DATE_COL}.dateKey"
+        km = _pick(cols, KM_CANDIDATES)
+        if "vehicleId" not in cols or date_key_col not in cols:
+            return None
+        revenue = "NULL"
+        join = ""
+        invoice_cols = table_columns(INVOICE_TABLE, conn)
+        invoice = _pick(invoice_cols, INVOICE_ID_CANDIDATES)
+        if "amount" in invoice_cols and invoice:
+            revenue = "r.revenue"
+            # an invoice row repeats once per duty it covers: split its amount evenly over those duties
+            join = f"""
+                LEFT JOIN (
+                    SELECT l."dutyId", TOTAL(i.amount / i.duties) AS revenue
+                    FROM (
+                        SELECT DISTINCT "dutyId", "{invoice}" AS invoice FROM "{INVOICE_TABLE}"
+                        WHERE "dutyId" IN (SELECT "dutyId" FROM "{DUTY_TABLE}" {_month_filter(f'"{date_key_col}"', months)})
+                    ) l
+                    JOIN (
+                        SELECT "{invoice}" AS invoice, MAX("amount") AS amount, COUNT(DISTINCT "dutyId") AS duties
+                        FROM "{INVOICE_TABLE}" GROUP BY "{invoice}"
+                    ) i ON i.invoice = l.invoice
+                    GROUP BY l."dutyId"
+                ) r ON r."dutyId" = d."dutyId"
+            """
+        return f"""
+            SELECT d."vehicleId" AS vehicleId, d."{date_key_col}" / 100 AS monthKey,
+                   {revenue} AS amount, {f'd."{km}"' if km else "NULL"} AS extra
+            FROM "{DUTY_TABLE}" d {join}
+            {_month_filter(f'd."{date_key_col}"', months)}
+        """
+
+    table = FUEL_TABLE if source == "fuel" else EXPENSE_TABLE
+    cols = table_columns(table, conn)
+    vehicle, date, amount = (_pick(cols, c) for c in (VEHICLE_CANDIDATES, DATE_CANDIDATES, AMOUNT_CANDIDATES))
+    if not (vehicle and date and amount) or f"{date}.dateKey" not in cols:
+        return None
+    litres = _pick(cols, LITRES_CANDIDATES) if source == "fuel" else None
+    return f"""
+        SELECT "{vehicle}" AS vehicleId, "{date}.dateKey" / 100 AS monthKey,
+               "{amount}" AS amount, {f'"{litres}"' if litres else "NULL"} AS extra
+        FROM "{table}"
+        {_month_filter(f'"{date}.dateKey"', months)}
+    """
+
+
+SOURCES = ["fuel", "expense", "duty"]
+
+
+def partition_fingerprints(conn):
+    """(source, monthKey, fingerprint) per month of each source: an order-independent digest of its rows.
+
+    Every (vehicleId, amount, extra) row is hashed, so moving an entry to another vehicle or
+    swapping amounts between vehicles changes the month even when its totals do not.
+    """
+    frames = []
+    for source in SOURCES:
+        sql = _source_sql(conn, source)
+        if sql is None:
+            print(f"  ⚠️ Skipping {source}: table or columns not found in the store")
+            continue
+        rows = pd.read_sql_query(f"SELECT * FROM ({sql}) WHERE monthKey IS NOT NULL", conn)
+        hashes = row_hashes(rows[["vehicleId", "amount", "extra"]])
+        months = rows.groupby("monthKey", sort=True).indices
+        df = pd.DataFrame({
+            "source": source,
+            "monthKey": list(months),
+            "fingerprint": [partition_digest(["vehicleId", "amount", "extra"], hashes[p]) for p in months.values()],
+        })
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=["source", "monthKey", "fingerprint"])
+    return pd.concat(frames, ignore_index=True).astype({"monthKey": "int64"})
+
+
+def changed_months(current, previous):
+    """Months whose fingerprint differs (or appeared / disappeared) in any source"""
+    if previous is None or previous.empty:
+        return set(current["monthKey"])
+    merged = current.merge(previous, on=["source", "monthKey"], how="outer", suffixes=("", "_prev"))
+    changed = merged["fingerprint"] != merged["fingerprint_prev"]
+    return set(merged.loc[changed, "monthKey"].astype("int64"))
+
+
+def _source_rollup(conn, source, months):
+    sql = _source_sql(conn, source, months)
+    if sql is None:
+        return None
+    rows = pd.read_sql_query(sql, conn)
+    rows["amount"] = pd.to_numeric(rows["amount"], errors="coerce")
+    rows["extra"] = pd.to_numeric(rows["extra"], errors="coerce")
+    grouped = rows.dropna(subset=["vehicleId", "monthKey"]).groupby(["vehicleId", "monthKey"])
+    names = {
+        "fuel": ("fuel_cost", "fuel_litres", "fuel_entries"),
+        "expense": ("expense_cost", None, "expense_entries"),
+        "duty": ("revenue", "km", "duties"),
+    }[source]
+    out = grouped.agg(**{names[0]: ("amount", "sum"), names[2]: ("amount", "size")})
+    if names[1]:
+        out[names[1]] = grouped["extra"].sum(min_count=1)
+    return out
+
+
+def compute_rollup(conn, months):
+    """Vehicle x month rollup for the given months (None = all): costs, km, revenue and the derived ratios"""
+    if months is not None and not months:
+        return pd.DataFrame()
+    parts = [p for p in (_source_rollup(conn, s, months) for s in SOURCES) if p is not None]
+    if not parts:
+        return pd.DataFrame()
+    rollup = pd.concat(parts, axis=1).reset_index()
+    for col in ["fuel_cost", "expense_cost", "revenue", "km", "fuel_litres"]:
+        if col not in rollup.columns:
+            rollup[col] = np.nan
+    for col in ["fuel_entries", "expense_entries", "duties"]:
+        rollup[col] = rollup[col].fillna(0).astype("int32") if col in rollup.columns else 0
+
+    km = rollup["km"].where(rollup["km"] > 0)
+    rollup["total_cost"] = rollup[["fuel_cost", "expense_cost"]].sum(axis=1, min_count=1)
+    rollup["cost_per_km"] = (rollup["total_cost"] / km).round(2)
+    rollup["fuel_cost_per_km"] = (rollup["fuel_cost"] / km).round(2)
+    rollup["litres_per_100km"] = (rollup["fuel_litres"] / km * 100).round(2)
+    rollup["cost_to_revenue_pct"] = (rollup["total_cost"] / rollup["revenue"].where(rollup["revenue"] > 0) * 100).round(1)
+    rollup["margin"] = (rollup["revenue"].fillna(0) - rollup["total_cost"].fillna(0)).round(2)
+    return rollup
+
+
+def update_vehicle_costs(full_refresh=False):
+    """Re-roll only the months whose fuel / expense / duty partitions changed since the last run"""
+    start = time.time()
+    conn = connect()
+    try:
+        current = partition_fingerprints(conn)
+        previous = None if full_refresh else load_table(PARTITION_TABLE)
+        months = changed_months(current, previous)
+        # a full re-roll reads whole tables instead of OR-ing every month range
+        fresh = compute_rollup(conn, None if months == set(current["monthKey"]) else months)
+    finally:
+        conn.close()
+
+    existing = None if full_refresh else load_table(ROLLUP_TABLE)
+    if existing is not None and not existing.empty:
+        kept = existing[~existing["monthKey"].isin(months)]
+        rollup = pd.concat([kept, fresh], ignore_index=True) if not fresh.empty else kept
+    else:
+        rollup = fresh
+    if not rollup.empty:
+        rollup = rollup.sort_values(["monthKey", "vehicleId"], ignore_index=True)
+
+    print(f"\n⛽ Vehicle costs: {len(months)} changed months re-rolled, {len(rollup)} vehicle-months total "
+          f"({time.time() - start:.2f}s)")
+    if months:
+        save_table(ROLLUP_TABLE, rollup)
+        save_table(PARTITION_TABLE, current)
+        excel_ready(rollup).to_excel(ONEDRIVE_PATH, index=False, engine="openpyxl")
+        print(f"✅ Saved vehicle cost rollup to: {ONEDRIVE_PATH}")
+    return rollup
+
+
+# === Example usage: python vehicle_costs.py [--full] ===
+if __name__ == "__main__":
+    update_vehicle_costs(full_refresh="--full" in sys.argv)
@@ -1,11 +1,23 @@
-import requests
-import json
 import time
-import pandas as pd
 from datetime import datetime, timedelta
+import fast_json
+from lazy_imports import LazyModule
+
+# heavy dependencies load on first use
+requests = LazyModule("requests")
+pd = LazyModule("pandas")
 
 # === Import auth handler ===
 from auth_refresh import get_auth_headers   # 👈 uses your existing auth_refresh.py
+from compact_types import excel_ready
+from ist_dates import parse_timestamps
+from data_quality import gate
+from local_store import save_table
+from arrow_outputs import write_arrow
+from month_partitions import write_partitions
+from page_archive import archive_page
+from vehicle_costs import update_vehicle_costs
+from fleet_anomalies import export_anomalies, screen
 
 # === API DETAILS ===
 API_URL = "https://app.indecab.com/api/beta/vehicle-fuels"   # 👈 duties API endpoint
@@ -25,7 +37,7 @@ def get_api_data(headers, body, page=1, limit=100):
         print(f"  Requesting page {page}...")
 
         try:
-            response = requests.post(API_URL, headers=headers, data=json.dumps(body_with_pagination), timeout=45)
+            response = requests.post(API_URL, headers=headers, data=fast_json.dumps(body_with_pagination), timeout=45)
         except requests.exceptions.Timeout:
             print("  Request timed out.")
             break
@@ -36,7 +48,7 @@ def get_api_data(headers, body, page=1, limit=100):
         # 🔑 If unauthorized (token expired) → refresh and retry once
         if response.status_code == 401:
             print("  ⚠️ Token expired, refreshing...")
-            headers = get_auth_headers()
+            headers = get_auth_headers(force=True)
             continue
 
         if response.status_code != 200:
@@ -47,7 +59,7 @@ def get_api_data(headers, body, page=1, limit=100):
             print(f"Error fetching API (page {page}): {response.text}")
             break
 
-        result = response.json()
+        result = fast_json.decode_response(response)
         data_page = result.get("data", [])
 
         print(f"  Received {len(data_page)} records on page {page}")
@@ -61,6 +73,7 @@ def get_api_data(headers, body, page=1, limit=100):
             break
 
         all_data.extend(data_page)
+        archive_page("vehicle_fuels", data_page, body["dateRange"]["start"])   # raw page, compressed + indexed
 
         if len(data_page) < limit:
             break
@@ -136,11 +149,23 @@ if __name__ == "__main__":
 
         df_invoices = pd.DataFrame(invoices_records) if invoices_records else pd.DataFrame()
 
+        # Parse all timestamp columns once (IST) and add date keys
+        parse_timestamps(df_duties)
+        parse_timestamps(df_invoices)
+        gate("vehicle_fuels", df_duties)
+
         # === Save both sheets into Excel ===
         with pd.ExcelWriter(ONEDRIVE_PATH, engine="openpyxl") as writer:
-            df_duties.to_excel(writer, sheet_name="Duties", index=False)
+            excel_ready(df_duties).to_excel(writer, sheet_name="Duties", index=False)
             if not df_invoices.empty:
-                df_invoices.to_excel(writer, sheet_name="Invoices", index=False)
+                excel_ready(df_invoices).to_excel(writer, sheet_name="Invoices", index=False)
+
+        save_table("vehicle_fuels", df_duties)
+        write_arrow("vehicle_fuels", df_duties)
+        write_partitions("vehicle_fuels", df_duties)
+        update_vehicle_costs()
+        screen(df_duties, "fuel")
+        export_anomalies()
 
         print(f"\n✅ Saved {len(all_results)} duties (completed) to OneDrive: {ONEDRIVE_PATH}")
     else:
@@ -0,0 +1,221 @@
+from bisect import insort, bisect_left
+from lazy_imports import LazyModule
+
+from compact_types import excel_ready
+from ist_dates import LOCAL_TZ
+from local_store import load_table, save_table
+
+# heavy dependencies load on first use
+pd = LazyModule("pandas")
+
+# === PATH TO SAVE FILE IN ONEDRIVE ===
+ONEDRIVE_PATH = r"C:\Users\lenovo\OneDrive\API Call\vehicle_utilization.xlsx"
+
+IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60
+DAY_SECONDS = 24 * 3600
+END_COLUMNS = ["dropOffTime", "dutySlip.endDate"]   # first non-null is the duty end
+INTERVAL_TABLE = "vehicle_utilization_intervals"    # engine state carried between runs
+
+
+def to_epoch_seconds(series):
+    """tz-aware datetime series -> float epoch seconds (NaN for NaT)"""
+    epoch = pd.Timestamp("1970-01-01", tz="UTC")
+    return (series - epoch) / pd.Timedelta(seconds=1)
+
+
+def ist_day(epoch_seconds):
+    """IST calendar day number (days since 1970-01-01 IST)"""
+    return int((epoch_seconds + IST_OFFSET_SECONDS) // DAY_SECONDS)
+
+
+def merge_intervals(intervals):
+    """Merge sorted (start, end, ...) tuples into non-overlapping [start, end] pairs"""
+    merged = []
+    for start, end, *_ in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class FleetUtilization:
+    """Per-vehicle sorted duty intervals with busy / idle / daily utilization views.
+
+    Duties can be added at any time; re-adding a dutyId replaces its old window,
+    unchanged duties are skipped, and only vehicles that changed are re-merged on the next read.
+    """
+
+    def __init__(self):
+        self.intervals = {}     # vehicleId -> sorted [(start, end, dutyId)]
+        self.duty_index = {}    # dutyId -> (vehicleId, interval tuple)
+        self._merged = {}       # vehicleId -> merged [[start, end]] (cache)
+        self._daily = {}        # vehicleId -> [(IST day, busy seconds)] (cache)
+
+    def _invalidate(self, vehicle_id):
+        self._merged.pop(vehicle_id, None)
+        self._daily.pop(vehicle_id, None)
+
+    def add_duty(self, duty_id, vehicle_id, start, end):
+        """Insert (or move) one duty window; start/end are epoch seconds"""
+        if vehicle_id is None or start is None or end is None or end <= start:
+            return False
+        if duty_id in self.duty_index:
+            self.remove_duty(duty_id)
+        interval = (start, end, duty_id)
+        insort(self.intervals.setdefault(vehicle_id, []), interval)
+        self.duty_index[duty_id] = (vehicle_id, interval)
+        self._invalidate(vehicle_id)
+        return True
+
+    def remove_duty(self, duty_id):
+        vehicle_id, interval = self.duty_index.pop(duty_id)
+        rows = self.intervals[vehicle_id]
+        del rows[bisect_left(rows, interval)]
+        self._invalidate(vehicle_id)
+
+    def add_duties(self, df, vehicle_col="vehicleId", start_col="pickUpTime"):
+        """Bulk-add duties from a frame with parsed (tz-aware) timestamp columns"""
+        end = None
+        for col in END_COLUMNS:
+            if col in df.columns:
+                end = df[col] if end is None else end.fillna(df[col])
+        if end is None:
+            raise KeyError(f"No duty end column found (tried {END_COLUMNS})")
+
+        frame = pd.DataFrame({
+            "vehicle": df[vehicle_col].astype(object).to_numpy(),
+            "start": to_epoch_seconds(df[start_col]).to_numpy(dtype="float64"),
+            "end": to_epoch_seconds(end).to_numpy(dtype="float64"),
+            "dutyId": df["dutyId"].astype(object).to_numpy(),
+        })
+        return self._add_windows(frame)
+
+    def _add_windows(self, frame):
+        """Add a (vehicle, start, end, dutyId) epoch frame; returns how many windows were new or moved"""
+        frame = frame.dropna()
+        frame = frame[frame["end"] > frame["start"]].drop_duplicates("dutyId", keep="last")
+        if self.duty_index and not frame.empty:
+            known = self.interval_frame()
+            merged = frame.merge(known, on="dutyId", how="left", suffixes=("", "_known"))
+            unchanged = (
+                (merged["vehicle"] == merged["vehicle_known"])
+                & (merged["start"] == merged["start_known"])
+                & (merged["end"] == merged["end_known"])
+            )
+            frame = frame[~unchanged.to_numpy()]
+
+        # duties seen before are moved: drop their old windows first
+        for duty_id in set(frame["dutyId"]).intersection(self.duty_index):
+            self.remove_duty(duty_id)
+
+        # one sort for the batch, then a linear merge of two sorted runs per vehicle
+        frame = frame.sort_values(["vehicle", "start", "end", "dutyId"])
+        for vehicle_id, group in frame.groupby("vehicle", sort=False):
+            new = list(zip(group["start"].tolist(), group["end"].tolist(), group["dutyId"].tolist()))
+            existing = self.intervals.get(vehicle_id)
+            self.intervals[vehicle_id] = sorted(existing + new) if existing else new
+            for interval in new:
+                self.duty_index[interval[2]] = (vehicle_id, interval)
+            self._invalidate(vehicle_id)
+        return len(frame)
+
+    def interval_frame(self):
+        """Every stored window as (vehicle, start, end, dutyId), the state persisted between runs"""
+        rows = [(vehicle_id, start, end, duty_id) for duty_id, (vehicle_id, (start, end, _)) in self.duty_index.items()]
+        return pd.DataFrame(rows, columns=["vehicle", "start", "end", "dutyId"])
+
+    @classmethod
+    def from_store(cls):
+        """Engine rebuilt from the windows saved by the previous run (empty on the first run)"""
+        fleet = cls()
+        stored = load_table(INTERVAL_TABLE)
+        if stored is not None and not stored.empty:
+            fleet._add_windows(stored.astype({"vehicle": object, "dutyId": object}))
+        return fleet
+
+    def busy_intervals(self, vehicle_id):
+        if vehicle_id not in self._merged:
+            self._merged[vehicle_id] = merge_intervals(self.intervals.get(vehicle_id, []))
+        return self._merged[vehicle_id]
+
+    def idle_gaps(self, vehicle_id):
+        """(gap start, gap end) between consecutive busy blocks"""
+        busy = self.busy_intervals(vehicle_id)
+        return [(busy[i][1], busy[i + 1][0]) for i in range(len(busy) - 1)]
+
+    def _vehicle_days(self, vehicle_id):
+        """Busy seconds per IST day for one vehicle (busy blocks split at midnight)"""
+        if vehicle_id not in self._daily:
+            per_day = {}
+            for start, end in self.busy_intervals(vehicle_id):
+                day = ist_day(start)
+                while start < end:
+                    day_end = (day + 1) * DAY_SECONDS - IST_OFFSET_SECONDS
+                    chunk_end = min(end, day_end)
+                    per_day[day] = per_day.get(day, 0.0) + (chunk_end - start)
+                    start, day = chunk_end, day + 1
+            self._daily[vehicle_id] = list(per_day.items())
+        return self._daily[vehicle_id]
+
+    def daily_utilization(self):
+        """One row per vehicle per IST day with busy hours and utilization %"""
+        rows = [
+            (vehicle_id, day, seconds)
+            for vehicle_id in self.intervals
+            for day, seconds in self._vehicle_days(vehicle_id)
+        ]
+        daily = pd.DataFrame(rows, columns=["vehicleId", "day", "busy_seconds"])
+        dates = pd.to_datetime(daily["day"], unit="D")
+        daily["date"] = dates
+        daily["dateKey"] = (dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day).astype("int32")
+        daily["busy_hours"] = (daily["busy_seconds"] / 3600).round(2)
+        daily["utilization_pct"] = (daily["busy_seconds"] / DAY_SECONDS * 100).round(1)
+        return daily.drop(columns=["day", "busy_seconds"]).sort_values(["vehicleId", "dateKey"], ignore_index=True)
+
+    def summary(self):
+        """Fleet view: busy hours, idle gaps and utilization over each vehicle's active span"""
+        rows = []
+        for vehicle_id, intervals in self.intervals.items():
+            busy = self.busy_intervals(vehicle_id)
+            if not busy:
+                continue
+            gaps = [end - start for start, end in self.idle_gaps(vehicle_id)]
+            busy_seconds = sum(end - start for start, end in busy)
+            first_day, last_day = ist_day(busy[0][0]), ist_day(busy[-1][1])
+            span_seconds = (last_day - first_day + 1) * DAY_SECONDS
+            rows.append({
+                "vehicleId": vehicle_id,
+                "duties": len(intervals),
+                "busy_hours": round(busy_seconds / 3600, 2),
+                "idle_gaps": len(gaps),
+                "avg_idle_gap_hours": round(sum(gaps) / len(gaps) / 3600, 2) if gaps else None,
+                "max_idle_gap_hours": round(max(gaps) / 3600, 2) if gaps else None,
+                "first_duty": pd.Timestamp(busy[0][0], unit="s", tz="UTC").tz_convert(LOCAL_TZ),
+                "last_duty_end": pd.Timestamp(busy[-1][1], unit="s", tz="UTC").tz_convert(LOCAL_TZ),
+                "utilization_pct": round(busy_seconds / span_seconds * 100, 1),
+            })
+        if not rows:
+            return pd.DataFrame(columns=["vehicleId", "duties", "busy_hours", "utilization_pct"])
+        return pd.DataFrame(rows).sort_values("utilization_pct", ascending=False, ignore_index=True)
+
+
+def export_utilization(df_duties, fleet=None):
+    """Extend the stored fleet engine with new / moved duties and write daily + fleet outputs"""
+    fleet = fleet or FleetUtilization.from_store()
+    known = len(fleet.duty_index)
+    added = fleet.add_duties(df_duties)
+    print(f"\n🚗 Utilization: {added} new or moved duty windows ({known} stored) across {len(fleet.intervals)} vehicles")
+    if added:
+        save_table(INTERVAL_TABLE, fleet.interval_frame())
+
+    df_daily = fleet.daily_utilization()
+    df_fleet = fleet.summary()
+    save_table("vehicle_utilization_daily", df_daily)
+    save_table("vehicle_utilization", df_fleet)
+    with pd.ExcelWriter(ONEDRIVE_PATH, engine="openpyxl") as writer:
+        excel_ready(df_daily).to_excel(writer, sheet_name="Daily", index=False)
+        excel_ready(df_fleet).to_excel(writer, sheet_name="Fleet", index=False)
+    print(f"✅ Saved vehicle utilization to: {ONEDRIVE_PATH}")
+    return fleet